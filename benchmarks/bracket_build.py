@@ -0,0 +1,58 @@
+"""Time building and playing out tournaments in each format.
+
+    python benchmarks/bracket_build.py
+    python benchmarks/bracket_build.py --players 256 200 37 --formats swiss --repeat 200
+
+"build" is Tournament.start_format() for already registered players: the
+seeded bracket with its byes (or the first Swiss pairing) plus round 1. "play"
+records every result and opens each following round until the format is
+finished, so for Swiss it includes every pairing.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bracket import FORMATS, PlayerRef
+from main import Tournament
+
+
+def registered(count):
+    tournament = Tournament()
+    for user_id in range(count):
+        tournament.add_player(PlayerRef(1000 + user_id, f"player{user_id}"))
+    tournament.seed_players({str(1000 + user_id): user_id % 50 for user_id in range(count)})
+    return tournament
+
+
+def play(tournament, name):
+    tournament.start_format(name)
+    while True:
+        for match_index in range(len(tournament.rounds[-1])):
+            tournament.record_result(tournament.match_players(match_index)[0].id)
+        if tournament.format.finished():
+            return len(tournament.rounds)
+        tournament.start_next_round()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, nargs='+', default=[256, 200, 37])
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'format':<8} {'players':>8} {'rounds':>7} {'build':>10} {'play':>10}")
+    for name in args.formats:
+        for count in args.players:
+            tournament = registered(count)
+            build = timeit.timeit(lambda: tournament.start_format(name), number=args.repeat) / args.repeat
+            full = timeit.timeit(lambda: play(tournament, name), number=args.repeat) / args.repeat
+            rounds = play(tournament, name)
+            print(f"{name:<8} {count:>8} {rounds:>7} {build * 1e3:>7.2f} ms {full * 1e3:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
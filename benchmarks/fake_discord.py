@@ -0,0 +1,229 @@
+"""A local stand-in for Discord's REST API, plugged in under discord.py.
+
+FakeSession replaces the aiohttp session of the bot's HTTPClient, which
+interactions share, so discord.py's own request, rate limit and webhook code
+runs unchanged. Requests wait a simulated latency, a share of them answer
+429 first, and every call is counted against the operation in
+`current_operation`, including calls made later by tasks the operation
+started (delete_after, debounced edits).
+"""
+import asyncio
+import contextvars
+import itertools
+import json
+import random
+import re
+from collections import Counter
+
+from multidict import CIMultiDict
+
+import discord
+
+current_operation = contextvars.ContextVar('current_operation', default='setup')
+
+_snowflakes = itertools.count(1 << 60)
+TIMESTAMP = '2025-01-01T00:00:00+00:00'
+
+
+def snowflake():
+    return next(_snowflakes)
+
+
+def user_payload(user_id, bot=False):
+    return {'id': str(user_id), 'username': f"player{user_id}", 'discriminator': '0',
+            'avatar': None, 'global_name': f"Player {user_id}", 'bot': bot}
+
+
+def member_payload(user_id):
+    return {'user': user_payload(user_id), 'roles': [], 'joined_at': TIMESTAMP, 'nick': None,
+            'deaf': False, 'mute': False, 'flags': 0}
+
+
+def guild_payload(guild_id, channel_id, owner_id, member_count):
+    return {
+        'id': str(guild_id), 'name': f"guild{guild_id}", 'owner_id': str(owner_id), 'member_count': member_count,
+        'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': str(discord.Permissions.general().value),
+                   'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': str(channel_id), 'type': 0, 'name': 'tournaments', 'position': 0,
+                      'permission_overwrites': []}],
+        'emojis': [], 'stickers': [], 'features': [],
+    }
+
+
+def message_payload(channel_id, author_id, content="", message_id=None, guild_id=None, bot=False, mentions=()):
+    data = {
+        'id': str(message_id or snowflake()), 'channel_id': str(channel_id), 'author': user_payload(author_id, bot),
+        'content': content, 'timestamp': TIMESTAMP, 'edited_timestamp': None, 'tts': False,
+        'mention_everyone': False, 'mentions': [user_payload(user_id) for user_id in mentions],
+        'mention_roles': [], 'attachments': [], 'embeds': [], 'components': [], 'pinned': False, 'type': 0,
+    }
+    if guild_id is not None:
+        data['guild_id'] = str(guild_id)
+        data['member'] = {key: value for key, value in member_payload(author_id).items() if key != 'user'}
+    return data
+
+
+def interaction_payload(application_id, guild_id, channel_id, user_id, custom_id, message):
+    member = member_payload(user_id)
+    member['permissions'] = str(discord.Permissions.general().value)
+    return {
+        'id': str(snowflake()), 'application_id': str(application_id), 'type': 3, 'token': f"token{snowflake()}",
+        'version': 1, 'guild_id': str(guild_id), 'channel_id': str(channel_id), 'member': member,
+        'channel': {'id': str(channel_id), 'type': 0, 'guild_id': str(guild_id), 'name': 'tournaments',
+                    'position': 0, 'permission_overwrites': []},
+        'data': {'custom_id': custom_id, 'component_type': 2}, 'message': message,
+        'app_permissions': '0', 'locale': 'en-US', 'guild_locale': 'en-US', 'entitlements': [],
+        'authorizing_integration_owners': {}, 'context': 0,
+    }
+
+
+class FakeResponse:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.reason = "Too Many Requests" if status == 429 else "OK"
+        self.headers = CIMultiDict(headers or {})
+        self._text = ""
+        if body is not None:
+            self._text = json.dumps(body)
+            self.headers['Content-Type'] = 'application/json'
+
+    async def text(self, encoding='utf-8'):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Request:
+    def __init__(self, session, method, url, kwargs):
+        self.session = session
+        self.args = (method, url, kwargs)
+        self.response = None
+
+    async def __aenter__(self):
+        self.response = await self.session.respond(*self.args)
+        return self.response
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+# (method, path pattern, responder name), first match wins
+ROUTES = [
+    ('POST', r'/interactions/(\d+)/[^/]+/callback', 'interaction_callback'),
+    ('POST', r'/channels/(\d+)/messages', 'create_message'),
+    ('PATCH', r'/channels/(\d+)/messages/(\d+)', 'edit_message'),
+    ('DELETE', r'/channels/(\d+)/messages/(\d+)', 'no_content'),
+    ('POST', r'/users/@me/channels', 'create_dm'),
+    ('PATCH', r'/webhooks/\d+/[^/]+/messages/[^/]+', 'webhook_message'),
+    ('POST', r'/webhooks/\d+/[^/?]+', 'webhook_message'),
+    ('DELETE', r'/webhooks/\d+/[^/]+/messages/[^/]+', 'no_content'),
+]
+
+
+class FakeSession:
+    """aiohttp.ClientSession look-alike answering Discord API routes locally"""
+
+    def __init__(self, bot_user_id, latency=0.05, jitter=0.02, rate_limit_rate=0.0, retry_after=0.05, seed=0):
+        self.bot_user_id = bot_user_id
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.routes = [(method, re.compile(r'https://discord\.com/api/v\d+' + pattern + r'(\?.*)?$'), name)
+                       for method, pattern, name in ROUTES]
+        self.calls = Counter()  # {operation: requests}
+        self.rate_limited = Counter()  # {operation: 429s}
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        return _Request(self, method, url, kwargs)
+
+    async def respond(self, method, url, kwargs):
+        operation = current_operation.get()
+        self.calls[operation] += 1
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        if self.random.random() < self.rate_limit_rate:
+            self.rate_limited[operation] += 1
+            return FakeResponse(429, {'message': "You are being rate limited.", 'retry_after': self.retry_after,
+                                      'global': False}, {'Via': '1.1 google'})
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(url)
+            if route_method == method and match:
+                response = getattr(self, name)(match, kwargs)
+                break
+        else:
+            name, response = 'other', FakeResponse(200, {})
+        # Roomy buckets, so discord.py runs requests concurrently like it does against Discord
+        response.headers.update({'X-Ratelimit-Bucket': f"{method}-{name}", 'X-Ratelimit-Limit': '50',
+                                 'X-Ratelimit-Remaining': '49', 'X-Ratelimit-Reset-After': '1.0'})
+        return response
+
+    def _body(self, kwargs):
+        data = kwargs.get('data')
+        if isinstance(data, (str, bytes)):
+            return json.loads(data)
+        return {}  # multipart uploads
+
+    def interaction_callback(self, match, kwargs):
+        return FakeResponse(200, {'interaction': {'id': match.group(1), 'type': 3}})
+
+    def create_message(self, match, kwargs):
+        body = self._body(kwargs)
+        return FakeResponse(200, message_payload(match.group(1), self.bot_user_id, body.get('content') or "", bot=True))
+
+    def edit_message(self, match, kwargs):
+        body = self._body(kwargs)
+        return FakeResponse(200, message_payload(match.group(1), self.bot_user_id, body.get('content') or "",
+                                                 message_id=match.group(2), bot=True))
+
+    def webhook_message(self, match, kwargs):
+        return FakeResponse(200, message_payload(snowflake(), self.bot_user_id, bot=True))
+
+    def create_dm(self, match, kwargs):
+        recipient = self._body(kwargs).get('recipient_id', 0)
+        return FakeResponse(200, {'id': str(snowflake()), 'type': 1, 'last_message_id': None,
+                                  'recipients': [user_payload(recipient)]})
+
+    def no_content(self, match, kwargs):
+        return FakeResponse(204)
+
+    async def close(self):
+        self.closed = True
+
+
+async def attach(bot, session):
+    """Point a not yet logged in bot at `session` instead of Discord"""
+    await bot._async_setup_hook()
+    bot.http._HTTPClient__session = session
+    bot.http._global_over = asyncio.Event()
+    bot.http._global_over.set()
+    bot.http.token = "offline"
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=user_payload(session.bot_user_id, bot=True))
+    state.application_id = session.bot_user_id
+
+
+def add_guild(bot, guild_id, channel_id, owner_id, member_ids):
+    """Create a cached guild with one text channel and the given members"""
+    state = bot._connection
+    guild = discord.Guild(data=guild_payload(guild_id, channel_id, owner_id, len(member_ids)), state=state)
+    for user_id in member_ids:
+        guild._add_member(discord.Member(data=member_payload(user_id), guild=guild, state=state))
+    state._add_guild(guild)
+    return guild
+
+
+def make_message(bot, channel, author_id, content="", message_id=None, mentions=(), from_bot=False):
+    data = message_payload(channel.id, author_id, content, message_id, channel.guild.id, from_bot, mentions)
+    return discord.Message(state=bot._connection, channel=channel, data=data)
+
+
+def make_interaction(bot, channel, user_id, custom_id, message):
+    data = interaction_payload(bot._connection.application_id, channel.guild.id, channel.id, user_id, custom_id,
+                               message_payload(channel.id, bot.user.id, message_id=message.id, bot=True))
+    return discord.Interaction(data=data, state=bot._connection)
@@ -0,0 +1,187 @@
+"""Drive the bot's real command and button handlers against a local fake Discord.
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --guilds 1000 --players 32 --latency 0.08 --rate-limit 0.05
+    python benchmarks/load_test.py --guilds 20 --players 8   # quick run for CI
+
+No token or network is needed: fake_discord.FakeSession answers the API
+calls under discord.py's own HTTP client. Every guild gets a channel, an
+open tournament and its players, then each phase fires all of its
+operations at once, the way a busy evening looks:
+
+    register_button  every player clicks Register (real TournamentButton callback)
+    start_button     the owner clicks Start
+    code             !code to the round 1 players, one DM each
+    winner           !winner for every round 1 match
+    sp_lb            !sp_lb
+
+Latency is from the handler being called to it returning. API calls per
+operation include calls made afterwards by tasks it started, such as the
+debounced counter edit after a burst of registrations; delete_after deletes
+only count if they fire before the run ends (see --drain). Runs are
+repeatable with the same --seed, up to scheduling jitter.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_discord import (FakeSession, add_guild, attach, current_operation, make_interaction, make_message,
+                          snowflake)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.wall = 0.0
+
+
+async def timed(phase, handler, delay=0.0):
+    """Run one operation with its API calls attributed to the phase"""
+    current_operation.set(phase.name)
+    if delay:
+        await asyncio.sleep(delay)
+    start = time.perf_counter()
+    try:
+        if await handler() is False:
+            phase.errors += 1
+    except Exception as e:
+        phase.errors += 1
+        print(f"{phase.name} failed: {e!r}")
+    phase.latencies.append(time.perf_counter() - start)
+
+
+async def run_phase(name, operations, burst):
+    """Start every operation within `burst` seconds and wait for all of them"""
+    phase = Phase(name)
+    rng = random.Random(name)
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(phase, handler, rng.uniform(0, burst)) for handler in operations))
+    phase.wall = time.perf_counter() - start
+    return phase
+
+
+async def run(args):
+    import main
+
+    session = FakeSession(snowflake(), args.latency, args.jitter, args.rate_limit, seed=args.seed)
+    bot = main.bot
+    await attach(bot, session)
+    rng = random.Random(args.seed)
+
+    guilds = []
+    for _ in range(args.guilds):
+        owner_id = snowflake()
+        player_ids = [snowflake() for _ in range(args.players)]
+        guild = add_guild(bot, snowflake(), snowflake(), owner_id, [owner_id] + player_ids)
+        channel = guild.text_channels[0]
+
+        message = make_message(bot, channel, bot.user.id, from_bot=True)
+        tournament = main.Tournament(message.id)
+        tournament.max_players = args.players
+        tournament.channel = tournament.target_channel = channel
+        tournament.title, tournament.map, tournament.abilities, tournament.prize = "Load test", "-", "-", "-"
+        tournament.transition(main.OPEN)
+        tournament.message = message
+        main.add_tournament(guild.id, tournament)
+        main.sp_data[str(guild.id)] = {str(user_id): rng.randint(0, 50) for user_id in player_ids}
+        guilds.append((guild, channel, owner_id, player_ids, tournament))
+
+    async def press(channel, user_id, action, tournament):
+        custom_id = f"tournament:{action}:{tournament.id}"
+        interaction = make_interaction(bot, channel, user_id, custom_id, tournament.message)
+        await main.TournamentButton(action, tournament.id).callback(interaction)
+
+    async def command(channel, author_id, content, mentions=()):
+        message = make_message(bot, channel, author_id, content, mentions=mentions)
+        ctx = await bot.get_context(message)
+        await bot.invoke(ctx)
+        return not ctx.command_failed
+
+    def winner_commands(channel, owner_id, tournament):
+        for match_index in range(len(tournament.rounds[-1])):
+            player = tournament.match_players(match_index)[0]
+            yield lambda player=player: command(channel, owner_id, f"!winner <@{player.id}>", [player.id])
+
+    phases = []
+    phases.append(await run_phase('register_button', [
+        lambda c=channel, u=user_id, t=tournament: press(c, u, 'register', t)
+        for guild, channel, owner_id, player_ids, tournament in guilds for user_id in player_ids
+    ], args.burst))
+    # The participant counters are edited once the bursts settle
+    await asyncio.gather(*list(main.pending_count_edits.values()))
+
+    phases.append(await run_phase('start_button', [
+        lambda c=channel, u=owner_id, t=tournament: press(c, u, 'start', t)
+        for guild, channel, owner_id, player_ids, tournament in guilds
+    ], args.burst))
+    phases.append(await run_phase('code', [
+        lambda c=channel, u=owner_id: command(c, u, "!code LOAD42")
+        for guild, channel, owner_id, player_ids, tournament in guilds
+    ], args.burst))
+    phases.append(await run_phase('winner', [
+        handler for guild, channel, owner_id, player_ids, tournament in guilds
+        for handler in winner_commands(channel, owner_id, tournament)
+    ], args.burst))
+    phases.append(await run_phase('sp_lb', [
+        lambda c=channel, u=owner_id: command(c, u, "!sp_lb")
+        for guild, channel, owner_id, player_ids, tournament in guilds
+    ], args.burst))
+
+    if args.drain:
+        await asyncio.sleep(args.drain)
+    for task in asyncio.all_tasks() - {asyncio.current_task()}:
+        task.cancel()
+    return phases, session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--players', type=int, default=16, help="players per tournament")
+    parser.add_argument('--latency', type=float, default=0.05, help="mean API latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="standard deviation of the latency")
+    parser.add_argument('--rate-limit', type=float, default=0.02, help="share of requests answered 429 first")
+    parser.add_argument('--burst', type=float, default=1.0, help="seconds over which a phase's operations start")
+    parser.add_argument('--drain', type=float, default=0.0, help="seconds to wait for delete_after and other late calls")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own output")
+    args = parser.parse_args()
+
+    # Nothing may reach the real storage file, and slow handler logs would drown the report
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault('STORAGE_PATH', os.path.join(scratch, 'load_test.json'))
+    os.environ.setdefault('EVENT_LOG_PATH', os.path.join(scratch, 'events.log'))
+    os.environ.setdefault('SLOW_HANDLER_MS', '60000')
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        phases, session = asyncio.run(run(args))
+
+    print(f"{args.guilds} guilds, {args.players} players each, {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms "
+          f"latency, {args.rate_limit:.0%} rate limited")
+    print(f"{'operation':<16} {'ops':>7} {'errors':>7} {'ops/s':>9} {'p50':>9} {'p99':>9} {'calls/op':>9} {'429s':>6}")
+    for phase in phases:
+        count = len(phase.latencies)
+        print(f"{phase.name:<16} {count:>7} {phase.errors:>7} {count / phase.wall:>9.1f} "
+              f"{percentile(phase.latencies, 0.5) * 1000:>6.0f} ms {percentile(phase.latencies, 0.99) * 1000:>6.0f} ms "
+              f"{session.calls[phase.name] / count:>9.2f} {session.rate_limited[phase.name]:>6}")
+
+
+if __name__ == "__main__":
+    main()
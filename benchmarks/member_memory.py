@@ -0,0 +1,87 @@
+"""Compare RSS of the default member cache with LOW_MEMORY mode.
+
+    python benchmarks/member_memory.py
+    python benchmarks/member_memory.py --members 10000 100000 --lru 5000
+
+Each scenario runs in its own process. "full" adds every simulated member to
+the guild like the default MemberCacheFlags do, "lean" uses
+MemberCacheFlags.none() and only keeps the members that went through the LRU.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def member_payload(user_id):
+    return {
+        'user': {'id': str(user_id), 'username': f"player{user_id}", 'discriminator': '0',
+                 'avatar': None, 'global_name': f"Player {user_id}"},
+        'roles': [], 'joined_at': None, 'nick': None, 'deaf': False, 'mute': False, 'flags': 0,
+    }
+
+
+def run_scenario(mode, count, lru_size):
+    import discord
+    from discord.http import HTTPClient
+    from discord.state import ConnectionState
+    from member_cache import MemberCache
+
+    loop = asyncio.new_event_loop()
+    intents = discord.Intents.default()
+    intents.members = True
+    flags = discord.MemberCacheFlags.all() if mode == 'full' else discord.MemberCacheFlags.none()
+    state = ConnectionState(dispatch=lambda *args: None, handlers={}, hooks={}, http=HTTPClient(loop),
+                            intents=intents, member_cache_flags=flags)
+    guild = discord.Guild(data={'id': '1', 'name': 'bench', 'roles': [], 'emojis': [], 'stickers': [],
+                                'features': [], 'member_count': count, 'owner_id': '1'}, state=state)
+    cache = MemberCache(lru_size)
+
+    gc.collect()
+    before = rss_kb()
+    for user_id in range(1000, 1000 + count):
+        member = discord.Member(data=member_payload(user_id), guild=guild, state=state)
+        if flags.joined:
+            guild._add_member(member)
+        else:
+            # Every member interacts once, only the most recent ones stay
+            cache.remember(member)
+    gc.collect()
+    after = rss_kb()
+
+    kept = len(guild._members) + len(cache)
+    print(f"{mode},{count},{kept},{after - before}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--lru', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'members':>8} {'cached':>8} {'RSS delta':>12}")
+    for count in args.members:
+        for mode in ('full', 'lean'):
+            output = subprocess.run([sys.executable, __file__, '--scenario', mode, str(count), str(args.lru)],
+                                    capture_output=True, text=True, check=True).stdout.strip()
+            mode_, count_, kept, delta = output.split(',')
+            print(f"{mode_:<6} {int(count_):>8} {int(kept):>8} {int(delta) / 1024:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == '--scenario':
+        run_scenario(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
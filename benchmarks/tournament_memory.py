@@ -0,0 +1,117 @@
+"""Measure what one running tournament keeps alive.
+
+    python benchmarks/tournament_memory.py
+    python benchmarks/tournament_memory.py --players 32 --tournaments 200
+
+"legacy" builds the old layout: Member objects in players, round tuples,
+results and eliminated. "compact" builds the current Tournament with PlayerRefs
+and array-backed rounds. Members are created, handed to the tournament and then
+dropped, so whatever tracemalloc still sees is pinned by the tournament.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from member_memory import member_payload
+
+
+def make_guild():
+    import discord
+    from discord.http import HTTPClient
+    from discord.state import ConnectionState
+
+    loop = asyncio.new_event_loop()
+    intents = discord.Intents.default()
+    intents.members = True
+    state = ConnectionState(dispatch=lambda *args: None, handlers={}, hooks={}, http=HTTPClient(loop),
+                            intents=intents, member_cache_flags=discord.MemberCacheFlags.none())
+    guild = discord.Guild(data={'id': '1', 'name': 'bench', 'roles': [], 'emojis': [], 'stickers': [],
+                                'features': [], 'member_count': 0, 'owner_id': '1'}, state=state)
+    return guild, state
+
+
+def play_legacy(members):
+    players = list(members)
+    rounds = []
+    results = []
+    eliminated = []
+    current = players
+    while len(current) > 1:
+        matches = [(current[i], current[i + 1]) for i in range(0, len(current), 2)]
+        rounds.append(matches)
+        winners = []
+        for a, b in matches:
+            winner, loser = (a, b) if random.random() < 0.5 else (b, a)
+            results.append((a, b, winner))
+            eliminated.append(loser)
+            winners.append(winner)
+        current = winners
+    return {'players': players, 'rounds': rounds, 'results': results, 'eliminated': eliminated}
+
+
+def play_compact(members):
+    from bracket import PlayerRef
+    from main import Tournament
+
+    tournament = Tournament()
+    for member in members:
+        tournament.add_player(PlayerRef.from_member(member))
+    tournament.start_format('single')
+    while True:
+        for match_index in range(len(tournament.rounds[-1])):
+            a, b, _ = tournament.match_players(match_index)
+            tournament.record_result(random.choice((a, b)).id)
+        if tournament.format.finished():
+            break
+        tournament.start_next_round()
+    tournament.renderer = None  # rendered embeds are not part of the bracket state
+    return tournament
+
+
+def measure(layout, players, count):
+    import discord
+
+    guild, state = make_guild()
+    build = play_legacy if layout == 'legacy' else play_compact
+    next_id = 1000
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = []
+    for _ in range(count):
+        members = [discord.Member(data=member_payload(user_id), guild=guild, state=state)
+                   for user_id in range(next_id, next_id + players)]
+        next_id += players
+        kept.append(build(members))
+        del members
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=32)
+    parser.add_argument('--tournaments', type=int, default=100)
+    args = parser.parse_args()
+
+    # Import the bot up front so building it is not counted
+    from main import Tournament  # noqa: F401
+
+    print(f"{'layout':<8} {'players':>8} {'per tournament':>16}")
+    for layout in ('legacy', 'compact'):
+        per_tournament = measure(layout, args.players, args.tournaments)
+        print(f"{layout:<8} {args.players:>8} {per_tournament / 1024:>13.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+from array import array
+
+PENDING = -1  # winner slot of a match without a result
+BYE = -2  # empty bracket slot, the other player advances without playing
+
+
+class PlayerRef:
+    """Small stand-in for a tournament player, the Member is looked up only when needed"""
+
+    __slots__ = ('id', 'name', 'is_fake')
+
+    def __init__(self, player_id, name, is_fake=False):
+        self.id = player_id
+        self.name = name
+        self.is_fake = is_fake
+
+    @classmethod
+    def from_member(cls, member):
+        return cls(member.id, member.display_name)
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, PlayerRef) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"PlayerRef({self.id}, {self.name!r}{', fake' if self.is_fake else ''})"
+
+
+class Round:
+    """Matches of one round as parallel arrays of player indices"""
+
+    __slots__ = ('a', 'b', 'winners', 'decided', 'nodes')
+
+    def __init__(self, pairs=(), nodes=()):
+        self.a = array('H')
+        self.b = array('H')
+        for a, b in pairs:
+            self.a.append(a)
+            self.b.append(b)
+        self.winners = array('h', [PENDING]) * len(self.a)
+        self.decided = 0
+        self.nodes = array('H', nodes)  # key of each match in the tournament's Format
+
+    def __len__(self):
+        return len(self.a)
+
+    def match(self, i):
+        return self.a[i], self.b[i]
+
+    def pairs(self):
+        return zip(self.a, self.b)
+
+    def winner(self, i):
+        """Player index of the match winner, PENDING if there is no result yet"""
+        return self.winners[i]
+
+    def set_winner(self, i, player):
+        if self.winners[i] == PENDING:
+            self.decided += 1
+        self.winners[i] = player
+
+    def complete(self):
+        return self.decided == len(self.a)
+
+
+
+def seed_order(size):
+    """Seed (0 = best) of each first round slot, so seed 1 can only meet seed 2 in the final"""
+    order = [0]
+    while len(order) < size:
+        slots = len(order) * 2
+        order = [seed for top in order for seed in (top, slots - 1 - top)]
+    return order
+
+
+def rank(players, key):
+    """[(place, player)] in key order, players with equal keys share a place"""
+    places = []
+    previous = None
+    for i, player in enumerate(sorted(players, key=key)):
+        value = key(player)
+        places.append((i + 1 if value != previous else places[-1][0], player))
+        previous = value
+    return places
+
+
+class Format:
+    """Decides who plays whom round by round and ranks the players at the end
+
+    Players are indices into the tournament's player list, in seed order. Each
+    match has a key, unique within the format, that results are reported with.
+    """
+
+    name = None
+
+    def __init__(self, player_count):
+        if player_count < 2:
+            raise ValueError("A tournament needs at least 2 players")
+        self.player_count = player_count
+        self.byes = 0  # players that got through the round just opened without playing
+
+    def next_matches(self):
+        """[(key, player, player)] of the next round, call once the previous one is complete"""
+        raise NotImplementedError
+
+    def set_winner(self, key, winner, loser):
+        raise NotImplementedError
+
+    def finished(self):
+        raise NotImplementedError
+
+    def placements(self):
+        """[(place, player)] best first, players that tie share a place"""
+        raise NotImplementedError
+
+    def label(self, key):
+        return ""
+
+
+# Where a match takes its players from
+SEED, WINNER, LOSER = 0, 1, 2
+SECTIONS = ("", "Winners", "Losers", "Grand Final", "Bracket Reset")
+
+
+class Elimination(Format):
+    """Bracket precomputed as a graph of matches fed by seeds, winners and losers
+
+    Matches are stored in creation order, which is also the order they can be
+    played in, as parallel arrays, and each match lists the matches its winner
+    and loser feed. Bracket slots past the player count are byes: a match with a
+    bye is decided on the spot and the other player moves on. A result only
+    looks at the matches it feeds, nothing is re-paired.
+    """
+
+    def __init__(self, player_count):
+        super().__init__(player_count)
+        size = 2
+        while size < player_count:
+            size *= 2
+        self.size = size
+        self.seeds = array('h', [seed if seed < player_count else BYE for seed in seed_order(size)])
+        self.kind_a, self.ref_a = array('B'), array('H')
+        self.kind_b, self.ref_b = array('B'), array('H')
+        self.stage = array('H')  # eliminations in a later stage rank higher
+        self.section = array('B')  # index into SECTIONS
+        self.winners, self.losers = array('h'), array('h')
+        self.feeds = []  # [[match]] fed by each match's winner or loser
+        self.ready = []  # matches with both players known, not handed out yet
+        self.queued = bytearray()
+        self.final = 0
+        self.reset = -1  # played only if the losers bracket side wins the grand final
+        self.advanced_by_bye = 0
+        self.build()
+        self.settle(range(len(self.winners)))
+
+    def build(self):
+        raise NotImplementedError
+
+    def add_match(self, source_a, source_b, stage, section=0):
+        self.kind_a.append(source_a[0])
+        self.ref_a.append(source_a[1])
+        self.kind_b.append(source_b[0])
+        self.ref_b.append(source_b[1])
+        self.stage.append(stage)
+        self.section.append(section)
+        self.winners.append(PENDING)
+        self.losers.append(PENDING)
+        self.queued.append(0)
+        self.feeds.append([])
+        match = len(self.winners) - 1
+        for kind, ref in (source_a, source_b):
+            if kind != SEED:
+                self.feeds[ref].append(match)
+        return match
+
+    def winners_bracket(self, section=0):
+        """Add the seeded bracket, returns the match indices of each round"""
+        rounds = [[self.add_match((SEED, slot), (SEED, slot + 1), 0, section) for slot in range(0, self.size, 2)]]
+        while len(rounds[-1]) > 1:
+            previous = rounds[-1]
+            stage = len(rounds)
+            rounds.append([self.add_match((WINNER, previous[i]), (WINNER, previous[i + 1]), stage, section)
+                           for i in range(0, len(previous), 2)])
+        return rounds
+
+    def player(self, kind, ref):
+        if kind == SEED:
+            return self.seeds[ref]
+        return self.winners[ref] if kind == WINNER else self.losers[ref]
+
+    def settle(self, matches):
+        """Look at matches whose feeders changed: decide byes and unneeded resets, queue the rest"""
+        pending = list(matches)
+        while pending:
+            match = pending.pop()
+            if self.winners[match] != PENDING or self.queued[match]:
+                continue
+            a = self.player(self.kind_a[match], self.ref_a[match])
+            b = self.player(self.kind_b[match], self.ref_b[match])
+            if a == PENDING or b == PENDING:
+                continue
+            if match == self.reset:
+                grand_final = self.ref_a[match]
+                upper = self.player(self.kind_a[grand_final], self.ref_a[grand_final])
+                if self.winners[grand_final] == upper:
+                    self.winners[match], self.losers[match] = upper, BYE
+                    continue
+            elif a == BYE or b == BYE:
+                self.winners[match] = b if a == BYE else a
+                self.losers[match] = BYE
+                if self.winners[match] != BYE:
+                    self.advanced_by_bye += 1
+                pending.extend(self.feeds[match])
+                continue
+            self.queued[match] = 1
+            self.ready.append(match)
+
+    def next_matches(self):
+        self.byes, self.advanced_by_bye = self.advanced_by_bye, 0
+        matches = [(match, self.player(self.kind_a[match], self.ref_a[match]),
+                    self.player(self.kind_b[match], self.ref_b[match])) for match in sorted(self.ready)]
+        self.ready = []
+        return matches
+
+    def set_winner(self, key, winner, loser):
+        self.winners[key] = winner
+        self.losers[key] = loser
+        self.settle(self.feeds[key])
+
+    def finished(self):
+        return self.winners[self.final] != PENDING
+
+    def placements(self):
+        # A player's last loss knocked them out, later knockouts rank higher
+        knocked_out = {}
+        for match in range(len(self.losers)):
+            if self.losers[match] >= 0:
+                knocked_out[self.losers[match]] = self.stage[match]
+        champion = self.winners[self.final]
+        knocked_out.pop(champion, None)
+        ranked = rank(knocked_out, key=lambda player: -knocked_out[player])
+        return [(1, champion)] + [(place + 1, player) for place, player in ranked]
+
+    def label(self, key):
+        return SECTIONS[self.section[key]]
+
+
+class SingleElimination(Elimination):
+    name = 'single'
+
+    def build(self):
+        self.final = self.winners_bracket()[-1][0]
+
+
+class DoubleElimination(Elimination):
+    """Losing once drops a player to the losers bracket, losing there knocks them out"""
+
+    name = 'double'
+
+    def build(self):
+        upper = self.winners_bracket(section=1)
+        stage = len(upper)
+        lower = []
+        if len(upper) > 1:
+            first = upper[0]
+            lower = [self.add_match((LOSER, first[i]), (LOSER, first[i + 1]), stage, 2) for i in range(0, len(first), 2)]
+        for round_number, dropped in enumerate(upper[1:], start=1):
+            # Players dropping in meet the lower bracket in reverse order every
+            # other round, so they don't face the opponent they just met again
+            if round_number % 2:
+                dropped = dropped[::-1]
+            stage += 1
+            lower = [self.add_match((WINNER, lower[i]), (LOSER, dropped[i]), stage, 2) for i in range(len(dropped))]
+            if len(lower) > 1:
+                stage += 1
+                lower = [self.add_match((WINNER, lower[i]), (WINNER, lower[i + 1]), stage, 2)
+                         for i in range(0, len(lower), 2)]
+
+        upper_final = upper[-1][0]
+        lower_source = (WINNER, lower[0]) if lower else (LOSER, upper_final)
+        grand_final = self.add_match((WINNER, upper_final), lower_source, stage + 1, 3)
+        self.reset = self.add_match((WINNER, grand_final), (LOSER, grand_final), stage + 2, 4)
+        self.final = self.reset
+
+
+class Swiss(Format):
+    """Fixed number of rounds, players meet others on the same score and never twice if avoidable"""
+
+    name = 'swiss'
+
+    def __init__(self, player_count, rounds=None):
+        super().__init__(player_count)
+        self.round_count = rounds or (player_count - 1).bit_length()
+        self.round_number = 0
+        self.scores = array('H', [0]) * player_count
+        self.opponents = [array('H') for _ in range(player_count)]
+        self.played = set()  # a * player_count + b with a < b
+        self.had_bye = bytearray(player_count)
+        self.winners = array('h')
+        self.decided = 0
+
+    def standings(self):
+        """Players by score, ties kept in seed order"""
+        return sorted(range(self.player_count), key=lambda player: (-self.scores[player], player))
+
+    def pair_key(self, a, b):
+        return min(a, b) * self.player_count + max(a, b)
+
+    def pair(self, order):
+        """Pair neighbours in the standings, then swap partners to undo rematches
+
+        Neighbours share a score group where possible and odd players float down
+        to the next group. A rematch (a, b) is fixed by swapping with the closest
+        earlier pair (c, d) where a-d and c-b are both new, which keeps the
+        pairing within or next to the score group. O(n^2) in the worst case.
+        """
+        pairs = []
+        unpaired = list(order)
+        while unpaired:
+            a = unpaired.pop(0)
+            partner = next((i for i, b in enumerate(unpaired) if self.pair_key(a, b) not in self.played), 0)
+            pairs.append([a, unpaired.pop(partner)])
+
+        for i in range(len(pairs) - 1, -1, -1):
+            a, b = pairs[i]
+            if self.pair_key(a, b) not in self.played:
+                continue
+            for j in range(i - 1, -1, -1):
+                c, d = pairs[j]
+                if self.pair_key(a, d) not in self.played and self.pair_key(c, b) not in self.played:
+                    pairs[i], pairs[j] = [a, d], [c, b]
+                    break
+        return pairs
+
+    def next_matches(self):
+        self.round_number += 1
+        order = self.standings()
+        self.byes = 0
+        if len(order) % 2:
+            # The lowest ranked player who hasn't sat out yet gets the bye and a win
+            bye = next((player for player in reversed(order) if not self.had_bye[player]), order[-1])
+            order.remove(bye)
+            self.had_bye[bye] = 1
+            self.scores[bye] += 1
+            self.byes = 1
+
+        matches = []
+        for a, b in self.pair(order):
+            self.played.add(self.pair_key(a, b))
+            self.opponents[a].append(b)
+            self.opponents[b].append(a)
+            self.winners.append(PENDING)
+            matches.append((len(self.winners) - 1, a, b))
+        return matches
+
+    def set_winner(self, key, winner, loser):
+        if self.winners[key] == PENDING:
+            self.decided += 1
+        self.winners[key] = winner
+        self.scores[winner] += 1
+
+    def finished(self):
+        return self.round_number >= self.round_count and self.decided == len(self.winners)
+
+    def placements(self):
+        # Ties on score go to the player whose opponents scored more (Buchholz), then the better seed
+        buchholz = [sum(self.scores[opponent] for opponent in self.opponents[player]) for player in range(self.player_count)]
+        order = sorted(range(self.player_count), key=lambda player: (-self.scores[player], -buchholz[player], player))
+        return [(place + 1, player) for place, player in enumerate(order)]
+
+
+FORMATS = {fmt.name: fmt for fmt in (SingleElimination, DoubleElimination, Swiss)}
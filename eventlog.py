@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bracket import PENDING
+
+CHECKPOINT = b'"kind":"checkpoint"'
+TAIL_CHUNK = 1 << 16  # bytes read at a time when looking for the last checkpoints
+
+
+def _encode(event):
+    return json.dumps(event, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b"\n"
+
+
+def _decode(lines):
+    for line in lines:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue  # a line torn by a crash
+
+
+def read_events(path):
+    """Every event of a log, oldest first"""
+    try:
+        with open(path, 'rb') as f:
+            yield from _decode(f)
+    except FileNotFoundError:
+        return
+
+
+def tail_events(path, checkpoints=2):
+    """Events after the `checkpoints`-th last checkpoint, the whole log if it has fewer. Reads backwards."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return []
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        chunks, found = [], 0
+        while position > 0 and found <= checkpoints:
+            step = min(TAIL_CHUNK, position)
+            position -= step
+            f.seek(position)
+            chunks.append(f.read(step))
+            found += chunks[-1].count(CHECKPOINT)
+    lines = b"".join(reversed(chunks)).split(b"\n")
+    if position > 0:
+        lines = lines[1:]  # starts mid-line
+    events = list(_decode(line for line in lines if line))
+    marks = [i for i, event in enumerate(events) if event['kind'] == 'checkpoint']
+    if len(marks) < checkpoints:
+        return events
+    return events[marks[-checkpoints] + 1:]
+
+
+class EventLog:
+    """Append-only log of tournament and SP events, one JSON object per line
+
+    Events are buffered and written by a background task every `interval`
+    seconds, a whole batch with one write and one fsync. Events carry absolute
+    values (SP totals, player order, match winners), so replaying an event the
+    stored data already reflects changes nothing.
+    """
+
+    def __init__(self, path='events.log', interval=0.5):
+        self.path = path
+        self.interval = interval
+        self.pending = []  # encoded events waiting for the next batch
+        self.seq = 0
+        self._task = None
+        self._flush_lock = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        # Counters
+        self.batches = 0
+        self.events_written = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+
+    def open(self):
+        """Prepare the log for appending and return the events to replay over the stored data
+
+        A checkpoint is logged after every storage flush. The flush before the
+        last one may have been written while later events were being logged,
+        so recovery replays everything after the second to last checkpoint.
+        """
+        try:
+            with open(self.path, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - TAIL_CHUNK))
+                tail = f.read()
+                if tail and not tail.endswith(b"\n"):
+                    # A crash tore the last batch, the next one must start on a new line
+                    f.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+        events = tail_events(self.path)
+        if events:
+            self.seq = events[-1]['seq']
+        return events
+
+    def append(self, kind, guild_id=None, **fields):
+        """Log an event, it is written with the next batch"""
+        self.seq += 1
+        event = {'seq': self.seq, 'time': round(time.time(), 3), 'kind': kind}
+        if guild_id is not None:
+            event['guild'] = str(guild_id)
+        event.update(fields)
+        self.pending.append(_encode(event))
+
+    def checkpoint(self):
+        """Mark that everything logged so far is in the stored data"""
+        self.append('checkpoint')
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error writing event log: {e}")
+
+    async def flush(self):
+        """Write every buffered event now"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            data = b"".join(batch)
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor, self._write, data)
+            except Exception:
+                self.write_errors += 1
+                self.pending = batch + self.pending
+                raise
+            self.batches += 1
+            self.events_written += len(batch)
+            self.bytes_written += len(data)
+
+    def _write(self, data):
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def close(self):
+        """Stop the background task and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+
+def _apply_tournament(event, snapshots):
+    """Apply a tournament event to a guild's {tournament_id: snapshot}, False if it is not about a known one"""
+    kind, tournament_id = event['kind'], event['tournament']
+    if kind == 'create':
+        snapshots[tournament_id] = copy.deepcopy(event['snapshot'])
+        return True
+    snapshot = snapshots.get(tournament_id)
+    if snapshot is None:
+        return False
+
+    if kind == 'register':
+        if all(player[0] != event['player'][0] for player in snapshot['players']):
+            snapshot['players'].append(list(event['player']))
+        if 'fake_count' in event:
+            snapshot['fake_count'] = event['fake_count']
+    elif kind == 'unregister':
+        snapshot['players'] = [player for player in snapshot['players'] if player[0] != event['user']]
+    elif kind == 'start':
+        snapshot.update(state=event['state'], format=event['format'], message=event['message'],
+                        players=copy.deepcopy(event['players']), results=[[PENDING] * event['matches']])
+    elif kind == 'result':
+        results = snapshot['results']
+        if len(results) < event['round']:
+            return False
+        for match_index, winner in event['winners']:
+            results[event['round'] - 1][match_index] = winner
+    elif kind == 'round':
+        snapshot['results'] = snapshot['results'][:event['round'] - 1] + [[PENDING] * event['matches']]
+        snapshot['message'] = event['message']
+    elif kind in ('finish', 'cancel'):
+        del snapshots[tournament_id]
+    else:
+        return False
+    return True
+
+
+TOURNAMENT_EVENTS = {'create', 'register', 'unregister', 'start', 'result', 'round', 'finish', 'cancel'}
+
+
+def replay(events, sp_data, tournament_snapshots):
+    """Apply events to {guild_id: {user_id: sp}} and {guild_id: {tournament_id: snapshot}}
+
+    Returns the set of (section, guild_id) that changed. Events about a
+    tournament that is not there, because it already ended or was created
+    before the first event, are skipped.
+    """
+    touched = set()
+    for event in events:
+        kind, guild = event['kind'], event.get('guild')
+        if kind in ('sp', 'award'):
+            sp_data.setdefault(guild, {}).update(event['sp'])
+            touched.add(('sp_data', guild))
+        elif kind == 'sp_reset':
+            sp_data[guild] = {}
+            touched.add(('sp_data', guild))
+        elif kind in TOURNAMENT_EVENTS:
+            snapshots = tournament_snapshots.setdefault(guild, {})
+            if _apply_tournament(event, snapshots):
+                touched.add(('tournaments', guild))
+            if not snapshots:
+                tournament_snapshots.pop(guild, None)
+    return touched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild SP and open tournaments from an event log")
+    parser.add_argument('path', help="event log, e.g. events.log")
+    parser.add_argument('--guild', help="only this guild")
+    parser.add_argument('--user', help="list the SP changes of this user instead")
+    args = parser.parse_args()
+
+    events = (event for event in read_events(args.path) if args.guild is None or event.get('guild') == args.guild)
+    if args.user:
+        for event in events:
+            if args.user in event.get('sp', {}):
+                when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['time']))
+                source = (f"tournament {event['tournament']}, place {event['place']}, +{event['points']}"
+                          if event['kind'] == 'award' else event.get('reason', event['kind']))
+                print(f"#{event['seq']} {when} guild {event['guild']}: {event['sp'][args.user]} SP ({source})")
+            elif event['kind'] == 'sp_reset':
+                print(f"#{event['seq']} guild {event['guild']}: season reset")
+        return
+
+    sp_data, tournament_snapshots = {}, {}
+    replay(events, sp_data, tournament_snapshots)
+    print(json.dumps({'sp_data': sp_data, 'tournaments': tournament_snapshots}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import random
+import time
+
+import discord
+
+
+class DeliveryReport:
+    """Outcome of a bulk DM send"""
+
+    def __init__(self):
+        self.sent = []  # [(recipient, latency_seconds)]
+        self.failed = []  # [(recipient, reason)]
+        self.retries = 0
+        self.elapsed = 0.0
+
+    @property
+    def sent_count(self):
+        return len(self.sent)
+
+    @property
+    def average_latency(self):
+        if not self.sent:
+            return 0.0
+        return sum(latency for _, latency in self.sent) / len(self.sent)
+
+    @property
+    def slowest(self):
+        """(recipient, latency_seconds) of the slowest delivery, or None"""
+        if not self.sent:
+            return None
+        return max(self.sent, key=lambda entry: entry[1])
+
+
+def _retry_delay(error, attempt, base_delay):
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after:
+        return retry_after
+    # Exponential backoff with a bit of jitter so retries don't line up
+    return base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+
+
+async def send_bulk_dm(recipients, content=None, *, concurrency=5, retries=3, base_delay=1.0, **kwargs):
+    """Send the same DM to many users at once and return a DeliveryReport
+
+    At most `concurrency` sends are in flight. discord.py already waits out the
+    per-route rate limit buckets; 429s that still reach us and server errors are
+    retried with backoff. Closed DMs (Forbidden) are not retried.
+    """
+    report = DeliveryReport()
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def deliver(recipient):
+        async with semaphore:
+            start = time.perf_counter()
+            for attempt in range(retries + 1):
+                try:
+                    await recipient.send(content, **kwargs)
+                    report.sent.append((recipient, time.perf_counter() - start))
+                    return
+                except discord.Forbidden:
+                    report.failed.append((recipient, "DMs closed"))
+                    return
+                except discord.RateLimited as e:
+                    error = e
+                except discord.HTTPException as e:
+                    if e.status != 429 and e.status < 500:
+                        report.failed.append((recipient, f"HTTP {e.status}"))
+                        return
+                    error = e
+                except Exception as e:
+                    report.failed.append((recipient, str(e) or type(e).__name__))
+                    return
+
+                if attempt < retries:
+                    report.retries += 1
+                    await asyncio.sleep(_retry_delay(error, attempt, base_delay))
+
+            status = getattr(error, 'status', 429)
+            report.failed.append((recipient, "rate limited" if status == 429 else f"HTTP {status}"))
+
+    await asyncio.gather(*(deliver(recipient) for recipient in recipients))
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import math
+
+from aiohttp import web
+
+LAG_INTERVAL = 1.0  # seconds between loop lag samples
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if math.isfinite(seconds) else None
+
+
+class RateLimitCounter(logging.Handler):
+    """Count the 429 warnings discord.py logs, it retries them without telling the bot"""
+
+    def __init__(self, counter):
+        super().__init__(logging.WARNING)
+        self.counter = counter
+        self._last = None  # scope of the latest 429, until it is counted
+
+    def emit(self, record):
+        message = str(record.msg)
+        if message.startswith("We are being rate limited"):
+            # Every 429 logs this, a global one logs "Global rate limit" right after it with nothing
+            # awaited in between, so the response is counted once the current step is done
+            scope = self._last = ['route']
+            try:
+                asyncio.get_running_loop().call_soon(self._count, scope)
+            except RuntimeError:
+                self._count(scope)
+        elif message.startswith("Global rate limit") and self._last is not None:
+            self._last[0] = 'global'
+
+    def _count(self, scope):
+        self.counter.inc(scope[0])
+        if self._last is scope:
+            self._last = None
+
+
+def count_api_calls(http, counter):
+    """Wrap the HTTP client so every Discord API request is counted by method and route"""
+    request = http.request
+
+    async def counted(route, **kwargs):
+        counter.inc(route.method, route.path)
+        return await request(route, **kwargs)
+
+    http.request = counted
+
+
+class HealthServer:
+    """/healthz, /readyz and /metrics served from the bot's own event loop"""
+
+    def __init__(self, bot, registry, port=8080, max_loop_lag=5.0):
+        self.bot = bot
+        self.registry = registry
+        self.port = port
+        self.max_loop_lag = max_loop_lag
+        self.loop_lag = 0.0
+        self._runner = None
+        self._lag_task = None
+
+        registry.gauge('pika_event_loop_lag_seconds', "How late the last loop lag sample woke up",
+                       fn=lambda: self.loop_lag)
+        registry.gauge('pika_gateway_latency_seconds', "Heartbeat latency, averaged over shards",
+                       fn=lambda: bot.latency)
+        registry.gauge('pika_guilds', "Guilds this process is connected to", fn=lambda: len(bot.guilds))
+
+        self.app = web.Application()
+        self.app.router.add_get('/', self.home)
+        self.app.router.add_get('/healthz', self.healthz)
+        self.app.router.add_get('/readyz', self.readyz)
+        self.app.router.add_get('/metrics', self.metrics)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '0.0.0.0', self.port).start()
+        self._lag_task = asyncio.create_task(self._sample_lag())
+        print(f"Health server listening on port {self.port}")
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _sample_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.loop_lag = max(0.0, loop.time() - start - LAG_INTERVAL)
+
+    def gateway(self):
+        """(shard_id, connected, latency) for every shard this process runs"""
+        bot = self.bot
+        if hasattr(bot, 'shards'):
+            return [(shard_id, not shard.is_closed() and math.isfinite(shard.latency), shard.latency)
+                    for shard_id, shard in bot.shards.items()]
+        ws = bot.ws
+        latency = bot.latency
+        return [(bot.shard_id, ws is not None and ws.open and math.isfinite(latency), latency)]
+
+    async def home(self, request):
+        return web.Response(text="I'm alive")
+
+    async def healthz(self, request):
+        shards = self.gateway()
+        connected = bool(shards) and all(ok for _, ok, _ in shards)
+        healthy = connected and not self.bot.is_closed() and self.loop_lag < self.max_loop_lag
+        body = {
+            'status': 'ok' if healthy else 'unhealthy',
+            'gateway_connected': connected,
+            'latency_ms': _ms(self.bot.latency),
+            'loop_lag_ms': _ms(self.loop_lag),
+            'shards': [{'id': shard_id, 'connected': ok, 'latency_ms': _ms(latency)}
+                       for shard_id, ok, latency in shards],
+        }
+        return web.json_response(body, status=200 if healthy else 503)
+
+    async def readyz(self, request):
+        ready = self.bot.is_ready() and not self.bot.is_closed()
+        return web.json_response({'ready': ready}, status=200 if ready else 503)
+
+    async def metrics(self, request):
+        return web.Response(text=self.registry.render(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
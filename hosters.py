@@ -0,0 +1,50 @@
+class HosterRoster:
+    """Hosters signed up on one registration message, in signup order"""
+
+    def __init__(self, max_hosters, channel_id=None, active=True):
+        self.max_hosters = max_hosters
+        self.channel_id = channel_id
+        self.active = active
+        self.hosters = {}  # {user_id: display name}, dicts keep signup order
+        self._listing = None
+
+    def __len__(self):
+        return len(self.hosters)
+
+    def __contains__(self, user_id):
+        return user_id in self.hosters
+
+    def is_full(self):
+        return len(self.hosters) >= self.max_hosters
+
+    def add(self, user_id, name):
+        self.hosters[user_id] = name
+        self._listing = None
+
+    def remove(self, user_id):
+        del self.hosters[user_id]
+        self._listing = None
+
+    def close(self):
+        self.active = False
+
+    def listing(self):
+        """Numbered hoster list for the embed, rebuilt only after a change"""
+        if self._listing is None:
+            self._listing = "".join(f"{i}. {name}\n" for i, name in enumerate(self.hosters.values(), 1))
+        return self._listing
+
+    def to_snapshot(self):
+        return {
+            'max_hosters': self.max_hosters,
+            'channel': self.channel_id,
+            'active': self.active,
+            'hosters': [[user_id, name] for user_id, name in self.hosters.items()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        roster = cls(snapshot['max_hosters'], snapshot['channel'], snapshot['active'])
+        for user_id, name in snapshot['hosters']:
+            roster.hosters[user_id] = name
+        return roster
@@ -0,0 +1,167 @@
+"""Run the bot as several worker processes, each owning a slice of the shards.
+
+    python launcher.py --workers 4               # shard count from Discord
+    python launcher.py --workers 4 --shards 16
+    python launcher.py --simulate 8 --workers 3  # local check, no token needed
+
+Discord sends every event of a guild to exactly one shard, (guild_id >> 22) %
+shard_count, so the process running that shard owns the guild's tournaments and
+SP. Workers share the SQLite storage backend; each one only writes rows of the
+guilds it owns.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+
+def shard_for_guild(guild_id, shard_count):
+    return (int(guild_id) >> 22) % shard_count
+
+
+def split_shards(shard_count, workers):
+    """Spread shard ids over workers as evenly as possible"""
+    return [list(range(shard_count))[i::workers] for i in range(workers)]
+
+
+def parse_shard_ids(value):
+    return [int(shard_id) for shard_id in value.split(',') if shard_id.strip()]
+
+
+async def recommended_shards(token):
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot",
+                               headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data['shards']
+
+
+def run_workers(shard_count, workers, storage_path):
+    from storage import SqliteStorage
+
+    # Import the old JSON data once, before the workers race for it
+    storage = SqliteStorage(storage_path)
+    storage.import_json('user_data.json')
+    storage.db.close()
+
+    processes = {}
+    assignments = split_shards(shard_count, workers)
+
+    def spawn(worker_id):
+        env = dict(os.environ)
+        env.update({
+            'SHARD_COUNT': str(shard_count),
+            'SHARD_IDS': ','.join(str(shard_id) for shard_id in assignments[worker_id]),
+            'WORKER_ID': str(worker_id),
+            'STORAGE_BACKEND': 'sqlite',
+            'STORAGE_PATH': storage_path,
+        })
+        print(f"🚀 Worker {worker_id}: shards {env['SHARD_IDS']}")
+        return subprocess.Popen([sys.executable, 'main.py'], env=env)
+
+    for worker_id in range(workers):
+        processes[worker_id] = spawn(worker_id)
+
+    try:
+        while True:
+            time.sleep(5)
+            for worker_id, process in processes.items():
+                if process.poll() is not None:
+                    print(f"❌ Worker {worker_id} exited with {process.returncode}, restarting")
+                    processes[worker_id] = spawn(worker_id)
+    except KeyboardInterrupt:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.wait()
+
+
+def _simulated_worker(storage_path, shard_count, shard_ids, guild_ids, awards):
+    """One fake worker: award SP in the guilds its shards own, like add_sp would"""
+    from storage import SqliteStorage
+
+    storage = SqliteStorage(storage_path, interval=0.01)
+    sp_data = {}
+    storage.attach('sp_data', sp_data)
+
+    async def run():
+        storage.start()
+        rng = random.Random(shard_ids[0] if shard_ids else 0)
+        for _ in range(awards):
+            guild_id = rng.choice(guild_ids)
+            # A worker never sees events of guilds it doesn't own
+            if shard_for_guild(guild_id, shard_count) not in shard_ids:
+                continue
+            guild_data = sp_data.setdefault(str(guild_id), {})
+            user_id = str(rng.randint(1, 50))
+            guild_data[user_id] = guild_data.get(user_id, 0) + 1
+            storage.mark_dirty('sp_data', guild_id, user_id)
+            await asyncio.sleep(0)
+        await storage.close()
+
+    asyncio.run(run())
+    return {guild: sum(users.values()) for guild, users in sp_data.items()}
+
+
+def simulate(shard_count, workers, guilds=200, awards=2000):
+    """Run fake workers against one SQLite file and check nobody overwrote anybody"""
+    from storage import SqliteStorage
+
+    guild_ids = [random.getrandbits(40) << 22 | random.getrandbits(22) for _ in range(guilds)]
+    assignments = split_shards(shard_count, workers)
+
+    owners = {}
+    for guild_id in guild_ids:
+        shard_id = shard_for_guild(guild_id, shard_count)
+        owners[guild_id] = [w for w, shard_ids in enumerate(assignments) if shard_id in shard_ids]
+    assert all(len(workers_) == 1 for workers_ in owners.values()), "every guild needs exactly one owner"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage_path = os.path.join(tmp, 'user_data.db')
+        SqliteStorage(storage_path).db.close()
+
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(_simulated_worker, [
+                (storage_path, shard_count, shard_ids, guild_ids, awards) for shard_ids in assignments
+            ])
+
+        expected = {}
+        for worker_totals in results:
+            for guild, total in worker_totals.items():
+                assert guild not in expected, f"guild {guild} was written by two workers"
+                expected[guild] = total
+
+        stored = SqliteStorage(storage_path).load()['sp_data']
+        actual = {guild: sum(users.values()) for guild, users in stored.items()}
+        assert actual == expected, "stored SP doesn't match what the workers awarded"
+
+    for worker_id, shard_ids in enumerate(assignments):
+        owned = sum(1 for w in owners.values() if w[0] == worker_id)
+        print(f"Worker {worker_id}: shards {shard_ids}, {owned} guilds")
+    print(f"✅ {shard_count} shards over {workers} workers: {len(expected)} guilds, {sum(expected.values())} SP, no conflicts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot across several processes")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--shards', type=int, default=None, help="total shard count, asks Discord if omitted")
+    parser.add_argument('--storage', default='user_data.db')
+    parser.add_argument('--simulate', type=int, metavar='SHARDS', help="simulate SHARDS shards locally instead")
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(args.simulate, args.workers)
+    else:
+        token = os.getenv("TOKEN")
+        if not token:
+            sys.exit("❌ No Discord token found! Set the TOKEN environment variable.")
+        shard_count = args.shards or asyncio.run(recommended_shards(token))
+        run_workers(shard_count, min(args.workers, shard_count), args.storage)
@@ -0,0 +1,71 @@
+from sortedcontainers import SortedList
+
+
+class Leaderboard:
+    """SP standings of one guild, kept sorted as points change"""
+
+    def __init__(self, scores=None):
+        self.scores = {}  # {user_id: sp}
+        self.ranking = SortedList()  # (-sp, user_id), best first
+        if scores:
+            self.scores = {int(user_id): sp for user_id, sp in scores.items()}
+            self.ranking = SortedList((-sp, user_id) for user_id, sp in self.scores.items())
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def update(self, user_id, sp):
+        user_id = int(user_id)
+        old = self.scores.get(user_id)
+        if old is not None:
+            self.ranking.remove((-old, user_id))
+        self.scores[user_id] = sp
+        self.ranking.add((-sp, user_id))
+
+    def remove(self, user_id):
+        user_id = int(user_id)
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            self.ranking.remove((-old, user_id))
+
+    def clear(self):
+        self.scores.clear()
+        self.ranking.clear()
+
+    def rank(self, user_id):
+        """1-based rank of a player, None if they have no SP entry"""
+        user_id = int(user_id)
+        sp = self.scores.get(user_id)
+        if sp is None:
+            return None
+        return self.ranking.index((-sp, user_id)) + 1
+
+    def user_ids(self, start, stop):
+        """User IDs ranked start+1 to stop"""
+        return [user_id for _, user_id in self.ranking.islice(start, stop)]
+
+    def page(self, page=1, per_page=10, is_present=None):
+        """Return [(rank, user_id, sp)] for a page, skipping players where is_present() is False
+
+        Skipped players don't count towards the page size, so a page is only
+        short when the standings run out.
+        """
+        skip = (page - 1) * per_page
+        if is_present is None:
+            return [(skip + i + 1, user_id, -neg_sp)
+                    for i, (neg_sp, user_id) in enumerate(self.ranking.islice(skip, skip + per_page))]
+
+        entries = []
+        for index, (neg_sp, user_id) in enumerate(self.ranking):
+            if not is_present(user_id):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            entries.append((index + 1, user_id, -neg_sp))
+            if len(entries) >= per_page:
+                break
+        return entries
+
+    def top(self, n=10, is_present=None):
+        return self.page(1, n, is_present)
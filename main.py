@@ -3,122 +3,783 @@ from discord.ext import commands
 import os
 import random
 import asyncio
-import json
-from datetime import datetime, timedelta
-from keep_alive import keep_alive
+import io
+import tempfile
+import logging
+import struct
+import time
+from array import array
+from contextlib import asynccontextmanager
+from datetime import datetime
+from storage import open_storage
+from leaderboard import Leaderboard
+from fanout import send_bulk_dm
+from launcher import shard_for_guild, parse_shard_ids
+from member_cache import DisplayNames, MemberCache, base_name
+from bracket import FORMATS, PENDING, PlayerRef, Round
+from hosters import HosterRoster
+from sp_io import parse_sp_csv, write_sp_csv
+from seasons import SeasonArchive
+from eventlog import EventLog, replay
+from metrics import Registry
+from health import HealthServer, RateLimitCounter, count_api_calls
+from profiling import HandlerTracer, LoopWatchdog, ProfileCapture
 
 TOKEN = os.getenv("TOKEN")
+SAVE_INTERVAL = float(os.getenv("SAVE_INTERVAL", "5"))
+REGISTRATION_EDIT_DELAY = float(os.getenv("REGISTRATION_EDIT_DELAY", "1.5"))
+PERMISSION_CACHE_TTL = float(os.getenv("PERMISSION_CACHE_TTL", "30"))
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")  # json or sqlite
+STORAGE_PATH = os.getenv("STORAGE_PATH")
+SEASON_DIR = os.getenv("SEASON_DIR", "seasons")  # archived SP seasons, one file pair per guild
+
+# Sharding, set by launcher.py when running several worker processes
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS", "")) or None
+SHARDED = os.getenv("SHARDED") == "1" or SHARD_COUNT is not None
+WORKER_ID = int(os.getenv("WORKER_ID", "0"))
+if SHARD_IDS is not None and STORAGE_BACKEND == 'json':
+    # The JSON file is rewritten whole on every flush, each worker would drop the others' guilds
+    raise SystemExit("❌ SHARD_IDS needs STORAGE_BACKEND=sqlite, workers can't share the JSON file")
+
+# Low memory mode keeps only recently seen members instead of every member of every guild
+LOW_MEMORY = os.getenv("LOW_MEMORY") == "1"
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "5000"))
+
+# Health and metrics server, each worker listens on its own port
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8080")) + WORKER_ID
+HEALTH_MAX_LOOP_LAG = float(os.getenv("HEALTH_MAX_LOOP_LAG", "5"))
+
+# Handlers slower than this are logged with their timings, loop stalls longer than this with the loop's stack
+SLOW_HANDLER_MS = float(os.getenv("SLOW_HANDLER_MS", "250"))
+LOOP_STALL_MS = float(os.getenv("LOOP_STALL_MS", "500"))
+
+# Append-only log of tournament and SP events, replayed over the stored data on startup
+EVENT_LOG_PATH = os.getenv("EVENT_LOG_PATH") or (f"events-{WORKER_ID}.log" if SHARDED else "events.log")
+EVENT_LOG_INTERVAL = float(os.getenv("EVENT_LOG_INTERVAL", "0.5"))
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class PikaBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    async def setup_hook(self):
+        load_data()
+        store.start()
+        event_log.start()
+        count_api_calls(self.http, API_CALLS)
+        watchdog.start()
+        try:
+            await health_server.start()
+        except OSError as e:
+            print(f"❌ Could not start health server on port {HEALTH_PORT}: {e}")
+
+    async def invoke(self, ctx):
+        ctx.started_at = time.perf_counter()
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        await tracer.trace(f"!{ctx.command.qualified_name}", super().invoke(ctx))
+
+    async def on_command_error(self, ctx, error):
+        observe_command(ctx, 'error')
+        await super().on_command_error(ctx, error)
+
+    async def close(self):
+        watchdog.stop()
+        await health_server.stop()
+        # Write any pending changes before the connection goes away
+        try:
+            await store.close()
+        except Exception as e:
+            print(f"Error flushing data on shutdown: {e}")
+        try:
+            await event_log.close()
+        except Exception as e:
+            print(f"Error writing event log on shutdown: {e}")
+        await super().close()
+
+bot_options = {}
+if SHARDED:
+    bot_options.update(shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+if LOW_MEMORY:
+    bot_options.update(member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+
+bot = PikaBot(command_prefix="!", intents=intents, **bot_options)
+member_cache = MemberCache(MEMBER_CACHE_SIZE)
+display_names = DisplayNames(MEMBER_CACHE_SIZE)
+
+# Metrics, served on /metrics by the health server
+metrics = Registry()
+COMMAND_LATENCY = metrics.histogram('pika_command_duration_seconds', "Time to run a prefix command",
+                                    ('command', 'status'))
+API_CALLS = metrics.counter('pika_discord_requests_total', "Discord API requests", ('method', 'route'))
+RATE_LIMITS = metrics.counter('pika_discord_rate_limits_total', "429 responses from Discord", ('scope',))
+logging.getLogger('discord.http').addHandler(RateLimitCounter(RATE_LIMITS))
+health_server = HealthServer(bot, metrics, HEALTH_PORT, HEALTH_MAX_LOOP_LAG)
+
+# Every command and component callback is timed step by step, see profiling.py
+HANDLER_BLOCKING = metrics.histogram('pika_handler_blocking_seconds', "Time a handler held the event loop",
+                                     ('handler',))
+tracer = HandlerTracer(SLOW_HANDLER_MS, on_trace=lambda trace: HANDLER_BLOCKING.observe(trace.blocking, trace.name))
+watchdog = LoopWatchdog(LOOP_STALL_MS)
+profile_capture = ProfileCapture()
+metrics.counter('pika_event_loop_stalls_total', "Times the event loop was blocked past LOOP_STALL_MS",
+                fn=lambda: watchdog.stalls)
+metrics.counter('pika_slow_handlers_total', "Handlers slower than SLOW_HANDLER_MS", fn=lambda: tracer.slow_count)
+
+def observe_command(ctx, status):
+    started = getattr(ctx, 'started_at', None)
+    if started is not None and ctx.command is not None:
+        COMMAND_LATENCY.observe(time.perf_counter() - started, ctx.command.qualified_name, status)
+
+@bot.listen()
+async def on_command_completion(ctx):
+    observe_command(ctx, 'ok')
+
+def owns_guild(guild_id):
+    """Whether this process runs the shard that receives the guild's events"""
+    if SHARD_COUNT is None or SHARD_IDS is None:
+        return True
+    return shard_for_guild(guild_id, SHARD_COUNT) in SHARD_IDS
+
+# Tournament states, in order
+CONFIGURING = 'configuring'
+OPEN = 'open'
+RUNNING = 'running'
+FINISHED = 'finished'
+
+MAX_PLAYERS = 256  # any count up to this works, missing bracket slots become byes
+PLACEMENT_SP = {1: 3, 2: 2, 3: 1, 4: 1}  # SP awarded per final placement
+EMBED_FIELD_LIMIT = 25  # rounds with more matches are listed compactly
+
+TOURNAMENT_TRANSITIONS = {
+    CONFIGURING: {OPEN},
+    OPEN: {RUNNING},
+    RUNNING: {FINISHED},
+    FINISHED: set(),
+}
 
 class Tournament:
-    def __init__(self):
-        self.players = []
+    def __init__(self, tournament_id=None):
+        self.id = tournament_id  # snowflake of the interaction that created it, also in button custom_ids
+        self.state = CONFIGURING
+        self.players = []  # [PlayerRef]
+        self.player_index = {}  # {player_id: index in players}
         self.max_players = 0
-        self.active = False
         self.channel = None
         self.target_channel = None
         self.message = None
-        self.rounds = []
-        self.results = []
-        self.eliminated = []
+        self.rounds = []  # [Round], matches refer to players by index
+        self.format = None  # bracket.Format, picked when the tournament starts
+        self.match_of = array('h')  # match index of each player in the current round, -1 if not playing
         self.fake_count = 1
         self.map = ""
         self.abilities = ""
         self.prize = ""
         self.title = ""
+        self.renderer = BracketRenderer()
+
+    @property
+    def active(self):
+        return self.state == RUNNING
+
+    def transition(self, state):
+        """Move to the next state, raises ValueError for an out of order change"""
+        if state not in TOURNAMENT_TRANSITIONS[self.state]:
+            raise ValueError(f"Tournament can't go from {self.state} to {state}")
+        self.state = state
 
-def get_tournament(guild_id):
-    """Get tournament for specific guild"""
-    if guild_id not in tournaments:
-        tournaments[guild_id] = Tournament()
-    return tournaments[guild_id]
+    def has_player(self, player_id):
+        return player_id in self.player_index
+
+    def add_player(self, player):
+        self.player_index[player.id] = len(self.players)
+        self.players.append(player)
+
+    def remove_player(self, player_id):
+        del self.players[self.player_index[player_id]]
+        self._reindex_players()
+
+    def shuffle_players(self):
+        random.shuffle(self.players)
+        self._reindex_players()
+
+    def seed_players(self, sp):
+        """Order players by SP, best first, ties in random order"""
+        random.shuffle(self.players)
+        self.players.sort(key=lambda player: sp.get(str(player.id), 0), reverse=True)
+        self._reindex_players()
+
+    def _reindex_players(self):
+        self.player_index = {player.id: i for i, player in enumerate(self.players)}
+
+    def start_format(self, name):
+        """Set up the format for the players in their current (seed) order and open round 1"""
+        self.rounds = []
+        self.format = FORMATS[name](len(self.players))
+        self.start_next_round()
+
+    def start_next_round(self):
+        matches = self.format.next_matches()
+        self.start_round([(a, b) for _, a, b in matches], [key for key, _, _ in matches])
+
+    def placements(self):
+        """[(place, PlayerRef)] once the format is finished"""
+        return [(place, self.players[player]) for place, player in self.format.placements()]
+
+    def start_round(self, round_pairs, nodes=()):
+        """Add a new round from (player index, player index) pairs and index its players"""
+        current_round = Round(round_pairs, nodes)
+        self.rounds.append(current_round)
+        self.match_of = array('h', [-1]) * len(self.players)
+        for i, (a, b) in enumerate(current_round.pairs()):
+            self.match_of[a] = i
+            self.match_of[b] = i
+
+    def record_result(self, player_id):
+        """Record the player as the winner of their match in the current round.
+
+        Returns (status, match_index, loser) where status is 'recorded',
+        'duplicate' (same winner reported again), 'conflict' (match already
+        has another winner) or 'not_found'.
+        """
+        player = self.player_index.get(player_id)
+        if player is None or self.match_of[player] < 0:
+            return 'not_found', -1, None
+
+        current_round = self.rounds[-1]
+        match_index = self.match_of[player]
+        current = current_round.winner(match_index)
+        if current != PENDING:
+            status = 'duplicate' if current == player else 'conflict'
+            return status, match_index, None
+
+        current_round.set_winner(match_index, player)
+        a, b = current_round.match(match_index)
+        loser = b if a == player else a
+        self.format.set_winner(current_round.nodes[match_index], player, loser)
+        return 'recorded', match_index, self.players[loser]
+
+    def check_results(self, player_ids):
+        """Sort a batch of winners into results to record and problems, records nothing
+
+        Returns (accepted, rejected): accepted is [(match_index, player_id)] and
+        rejected is [(status, player_id, match_index)] with the statuses of
+        record_result, plus 'same_match' when the batch names both players of
+        one match.
+        """
+        accepted, rejected, claimed = [], [], {}
+        for player_id in player_ids:
+            player = self.player_index.get(player_id)
+            if player is None or self.match_of[player] < 0:
+                rejected.append(('not_found', player_id, -1))
+                continue
+            match_index = self.match_of[player]
+            current = self.rounds[-1].winner(match_index)
+            if current != PENDING:
+                rejected.append(('duplicate' if current == player else 'conflict', player_id, match_index))
+            elif claimed.get(match_index, player_id) != player_id:
+                rejected.append(('same_match', player_id, match_index))
+            elif match_index not in claimed:
+                claimed[match_index] = player_id
+                accepted.append((match_index, player_id))
+        return accepted, rejected
+
+    def round_complete(self):
+        return bool(self.rounds) and self.rounds[-1].complete()
+
+    def match_players(self, match_index, round_index=-1):
+        """(PlayerRef, PlayerRef, winner PlayerRef or None) of a match"""
+        match_round = self.rounds[round_index]
+        a, b = match_round.match(match_index)
+        winner = match_round.winner(match_index)
+        return self.players[a], self.players[b], self.players[winner] if winner != PENDING else None
+
+    def to_snapshot(self):
+        """Compact form of the tournament, matches refer to players by index"""
+        return {
+            'max_players': self.max_players,
+            'state': self.state,
+            'channel': self.channel.id if self.channel else None,
+            'target_channel': self.target_channel.id if self.target_channel else None,
+            'message': [self.message.channel.id, self.message.id] if self.message else None,
+            'players': [[p.id, p.name, p.is_fake] for p in self.players],
+            'format': self.format.name if self.format else None,
+            'results': [list(r.winners) for r in self.rounds],
+            'fake_count': self.fake_count,
+            'map': self.map,
+            'abilities': self.abilities,
+            'prize': self.prize,
+            'title': self.title,
+        }
+
+    def channel_ids(self):
+        """Channels the tournament is run from: registration and current bracket message"""
+        channel_ids = {channel.id for channel in (self.target_channel, self.channel) if channel}
+        if self.message:
+            channel_ids.add(self.message.channel.id)
+        return channel_ids
+
+    @classmethod
+    def from_snapshot(cls, snapshot, guild, tournament_id):
+        """Rebuild a tournament from to_snapshot() output"""
+        tournament = cls(tournament_id)
+        tournament.max_players = snapshot['max_players']
+        tournament.state = snapshot['state']
+        tournament.channel = guild.get_channel(snapshot['channel']) if snapshot['channel'] else None
+        tournament.target_channel = guild.get_channel(snapshot['target_channel']) if snapshot['target_channel'] else None
+        if snapshot['message']:
+            channel_id, message_id = snapshot['message']
+            channel = guild.get_channel(channel_id)
+            if channel:
+                # Fetched only when the message is actually needed
+                tournament.message = channel.get_partial_message(message_id)
+        for player_id, name, is_fake in snapshot['players']:
+            tournament.add_player(PlayerRef(player_id, name, is_fake))
+        if snapshot['format']:
+            # Pairings are deterministic, replaying the results rebuilds every round
+            tournament.format = FORMATS[snapshot['format']](len(tournament.players))
+            for winners in snapshot['results']:
+                tournament.start_next_round()
+                for winner in winners:
+                    if winner != PENDING:
+                        tournament.record_result(tournament.players[winner].id)
+        tournament.fake_count = snapshot['fake_count']
+        tournament.map = snapshot['map']
+        tournament.abilities = snapshot['abilities']
+        tournament.prize = snapshot['prize']
+        tournament.title = snapshot['title']
+        return tournament
+
+def get_tournament(guild_id, tournament_id):
+    """Get a tournament by ID, restored from its snapshot after a restart. None if there is none."""
+    guild_tournaments = tournaments.setdefault(guild_id, {})
+    if tournament_id not in guild_tournaments:
+        snapshot = tournament_snapshots.get(str(guild_id), {}).get(str(tournament_id))
+        guild = bot.get_guild(guild_id)
+        if not snapshot or not guild:
+            return None
+        try:
+            guild_tournaments[tournament_id] = Tournament.from_snapshot(snapshot, guild, tournament_id)
+            print(f"✅ Restored tournament {tournament_id} for guild {guild_id}")
+        except Exception as e:
+            print(f"Error restoring tournament {tournament_id} for guild {guild_id}: {e}")
+            return None
+    return guild_tournaments[tournament_id]
+
+def guild_tournaments(guild_id):
+    """Every open or running tournament of a guild"""
+    for tournament_id in list(tournament_snapshots.get(str(guild_id), {})):
+        get_tournament(guild_id, int(tournament_id))
+    return list(tournaments.get(guild_id, {}).values())
+
+NO_TOURNAMENT_HERE = "❌ No tournament found. Use `!create #channel` first, or run the command in the tournament's channel."
+
+def find_tournament(guild_id, channel_id):
+    """The tournament a command in this channel is about: the guild's only one, or the one run from the channel"""
+    candidates = guild_tournaments(guild_id)
+    if len(candidates) == 1:
+        return candidates[0]
+    for tournament in candidates:
+        if channel_id in tournament.channel_ids():
+            return tournament
+    return None
+
+def add_tournament(guild_id, tournament):
+    tournaments.setdefault(guild_id, {})[tournament.id] = tournament
+    save_tournament(guild_id, tournament)
+
+def save_tournament(guild_id, tournament):
+    """Snapshot a tournament after it changed"""
+    tournament_snapshots.setdefault(str(guild_id), {})[str(tournament.id)] = tournament.to_snapshot()
+    save_data('tournaments', guild_id, tournament.id)
+
+def log_tournament(kind, guild_id, tournament, **fields):
+    event_log.append(kind, guild_id, tournament=str(tournament.id), **fields)
+
+def log_start(guild_id, tournament):
+    """Log the seeded player order and round 1, later rounds are logged as they open"""
+    snapshot = tournament.to_snapshot()
+    log_tournament('start', guild_id, tournament, state=snapshot['state'], format=snapshot['format'],
+                   players=snapshot['players'], matches=len(tournament.rounds[0]), message=snapshot['message'])
+
+def end_tournament(guild_id, tournament):
+    """Drop a finished or cancelled tournament from memory and storage"""
+    log_tournament('finish' if tournament.state == FINISHED else 'cancel', guild_id, tournament)
+    tournaments.get(guild_id, {}).pop(tournament.id, None)
+    tournament_locks.pop((guild_id, tournament.id), None)
+    guild_snapshots = tournament_snapshots.get(str(guild_id), {})
+    guild_snapshots.pop(str(tournament.id), None)
+    if not guild_snapshots:
+        tournament_snapshots.pop(str(guild_id), None)
+        tournaments.pop(guild_id, None)
+    save_data('tournaments', guild_id, tournament.id)
 
 # Store user data (all server-specific)
 sp_data = {}  # {guild_id: {user_id: sp_amount}}
-tournaments = {}  # {guild_id: Tournament}
+tournaments = {}  # {guild_id: {tournament_id: Tournament}}, open and running ones only
 role_permissions = {}  # {guild_id: {'htr': [role_ids], 'adr': [role_ids], 'tlr': [role_ids]}}
+bracket_roles = {}  # {guild_id: {user_id: [emojis]}}
+leaderboards = {}  # {guild_id: Leaderboard}, built on first use
+tournament_snapshots = {}  # {guild_id: {tournament_id: snapshot}}, what gets persisted of tournaments
+hoster_registrations = {}  # {guild_id: {message_id: roster snapshot}}, persisted
+hoster_rosters = {}  # {guild_id: {message_id: HosterRoster}}, built from hoster_registrations on first use
+tournament_locks = {}  # {(guild_id, tournament_id or None for the guild): asyncio.Lock}
+
+# Lock contention, summed over guilds to keep the metrics small
+LOCK_ACQUIRED = metrics.counter('pika_tournament_lock_acquired_total', "Tournament lock acquisitions")
+LOCK_CONTENDED = metrics.counter('pika_tournament_lock_contended_total',
+                                 "Tournament lock acquisitions that had to wait for another handler")
+LOCK_WAIT = metrics.histogram('pika_tournament_lock_wait_seconds', "Time spent waiting for a tournament lock")
+
+@asynccontextmanager
+async def tournament_lock(guild_id, tournament_id=None):
+    """Serialize changes to one tournament, or without an ID the creation of a guild's tournaments"""
+    lock = tournament_locks.setdefault((guild_id, tournament_id), asyncio.Lock())
+    contended = lock.locked()
+    start = time.perf_counter()
+    async with lock:
+        LOCK_WAIT.observe(time.perf_counter() - start)
+        LOCK_ACQUIRED.inc()
+        if contended:
+            LOCK_CONTENDED.inc()
+        yield
+
+@asynccontextmanager
+async def locked_tournament(guild_id, tournament_id=None, channel_id=None):
+    """Hold the lock of a tournament found by ID, or by the channel a command ran in
+
+    Yields None if there is no such tournament or it ended while waiting for
+    its lock. Finding it awaits nothing, so no guild-wide lock is needed.
+    """
+    if tournament_id is not None:
+        tournament = get_tournament(guild_id, tournament_id)
+    else:
+        tournament = find_tournament(guild_id, channel_id)
+    if tournament is None:
+        yield None
+        return
+    async with tournament_lock(guild_id, tournament.id):
+        yield tournament if get_tournament(guild_id, tournament.id) is tournament else None
 
 def get_player_display_name(player, guild_id=None):
-    """Get player display name"""
-    if isinstance(player, FakePlayer):
-        return player.display_name
-
-    # Priority: nick > display_name > name > str(player)
-    base_name = ""
-    if hasattr(player, 'user.name') and player.user.name:
-        base_name = player.user.name
-    elif hasattr(player, 'user.name'):
-        base_name = player.user.name
-    elif hasattr(player, 'user.name'):
-        base_name = player.user.name
-    else:
-        base_name = str(player)
+    """Bracket name of a player, cached per guild until the member or their bracket emojis change"""
+    name = display_names.get(guild_id, player.id)
+    if name is None:
+        name = resolve_bracket_name(player, guild_id)
+        display_names.set(guild_id, player.id, name)
+    return name
+
+def resolve_bracket_name(player, guild_id):
+    """Nick, display name or username, followed by the player's bracket role emojis"""
+    member = player
+    if isinstance(player, PlayerRef):
+        if player.is_fake:
+            return player.name
+        guild = bot.get_guild(guild_id) if guild_id else None
+        # Members who left, or are not cached in low memory mode, keep the name they registered with
+        member = (member_cache.get(guild_id, player.id) or guild.get_member(player.id)) if guild else None
+    name = base_name(member) if member is not None else player.name
+    emojis = bracket_roles.get(str(guild_id), {}).get(str(player.id))
+    return f"{name} {''.join(emojis)}" if emojis else name
+
+class BracketRenderer:
+    """Builds the bracket embed of the current round and caches the match fields"""
 
-    return base_name
+    def __init__(self):
+        self.round_number = 0
+        self.compact = False  # one line per match instead of one field, for big rounds
+        self.fields = []  # [(name, value)] per match
+        self.sent_fields = None  # fields as they were last sent to Discord
+        self.byes = 0
+
+    @staticmethod
+    def match_field(i, a, b, winner, guild_id):
+        player_a = get_player_display_name(a, guild_id)
+        player_b = get_player_display_name(b, guild_id)
+        if winner is None:
+            winner_line = "<:Crown:1409926966236283012> Winner: *Waiting...*"
+        else:
+            winner_line = f"<:Crown:1409926966236283012> Winner: **{get_player_display_name(winner, guild_id)}**"
+        return (f"⚔️ Match {i + 1}", f"**{player_a}** <:VS:1402690899485655201> **{player_b}**\n{winner_line}")
+
+    @staticmethod
+    def match_line(i, a, b, winner, guild_id):
+        line = f"`{i + 1}.` {get_player_display_name(a, guild_id)} vs {get_player_display_name(b, guild_id)}"
+        if winner is not None:
+            line += f" → **{get_player_display_name(winner, guild_id)}**"
+        return (None, line)
+
+    def render_match(self, tournament, match_index, guild_id):
+        render = self.match_line if self.compact else self.match_field
+        name, value = render(match_index, *tournament.match_players(match_index), guild_id)
+        label = tournament.format.label(tournament.rounds[-1].nodes[match_index])
+        if name and label:
+            name = f"{name} · {label}"
+        return (name, value)
+
+    def render_round(self, tournament, guild_id):
+        """Render every match of the current round"""
+        self.round_number = len(tournament.rounds)
+        self.compact = len(tournament.rounds[-1]) > EMBED_FIELD_LIMIT
+        self.byes = tournament.format.byes
+        self.fields = [self.render_match(tournament, i, guild_id) for i in range(len(tournament.rounds[-1]))]
+        self.sent_fields = None
+
+    def update_match(self, tournament, match_index, guild_id):
+        """Re-render one match, returns True if its field changed"""
+        if self.round_number != len(tournament.rounds):
+            self.render_round(tournament, guild_id)
+            return True
+
+        field = self.render_match(tournament, match_index, guild_id)
+        if self.fields[match_index] == field:
+            return False
+        self.fields[match_index] = field
+        return True
 
-# Load data
-def load_data():
-    global sp_data, role_permissions
-    try:
-        with open('user_data.json', 'r') as f:
-            data = json.load(f)
-            sp_data = data.get('sp_data', {})
-            role_permissions = data.get('role_permissions', {})
-    except FileNotFoundError:
-        pass
+    def embed(self, tournament):
+        description = f"**Map:** {tournament.map}\n**Abilities:** {tournament.abilities}"
+        if self.byes:
+            description += f"\n**Byes:** {self.byes} player{'s' if self.byes > 1 else ''} go through without playing this round"
+        embed = discord.Embed(
+            title=f"🏆 {tournament.title} - Round {self.round_number}",
+            description=description,
+            color=0x3498db
+        )
+        if not self.compact:
+            for name, value in self.fields:
+                embed.add_field(name=name, value=value, inline=False)
+        else:
+            # Pack match lines into as few fields as fit, within the embed size limit
+            chunk, chunk_size, budget, shown = [], 0, 5000 - len(description), 0
+            for _, line in self.fields:
+                if len(line) + 1 > budget:
+                    break
+                if chunk_size + len(line) > 1024:
+                    embed.add_field(name="⚔️ Matches", value="\n".join(chunk), inline=False)
+                    chunk, chunk_size = [], 0
+                chunk.append(line)
+                chunk_size += len(line) + 1
+                budget -= len(line) + 1
+                shown += 1
+            if chunk:
+                embed.add_field(name="⚔️ Matches", value="\n".join(chunk), inline=False)
+            if shown < len(self.fields):
+                embed.add_field(name="…", value=f"{len(self.fields) - shown} more matches", inline=False)
+        embed.set_footer(text="Use !winners @player1 @player2 ... or Report Results to record match results")
+        return embed
+
+    async def send(self, tournament, channel):
+        """Post the current round as a new message"""
+        message = await channel.send(embed=self.embed(tournament), view=BracketView(tournament.id))
+        self.sent_fields = list(self.fields)
+        return message
+
+    async def sync(self, tournament):
+        """Edit the bracket message, skipped when nothing visible changed"""
+        if self.sent_fields == self.fields or not tournament.message:
+            return False
+        await tournament.message.edit(embed=self.embed(tournament))
+        self.sent_fields = list(self.fields)
+        return True
 
-def save_data():
-    data = {
-        'sp_data': sp_data,
-        'role_permissions': role_permissions
-    }
-    with open('user_data.json', 'w') as f:
-        json.dump(data, f)
+# Persistence: changes are marked dirty and flushed in the background
+store = open_storage(STORAGE_BACKEND, STORAGE_PATH, interval=SAVE_INTERVAL)
+store.attach('sp_data', sp_data)
+store.attach('role_permissions', role_permissions)
+store.attach('bracket_roles', bracket_roles)
+store.attach('tournaments', tournament_snapshots)
+store.attach('hoster_registrations', hoster_registrations)
+season_archive = SeasonArchive(SEASON_DIR)
+
+# Events reach the log before the data they changed is written, each flush is a checkpoint
+event_log = EventLog(EVENT_LOG_PATH, interval=EVENT_LOG_INTERVAL)
+store.before_flush = event_log.flush
+
+STORAGE_FLUSH = metrics.histogram('pika_storage_flush_seconds', "Time to write pending changes to storage")
+
+def after_flush(elapsed_ms):
+    STORAGE_FLUSH.observe(elapsed_ms / 1000)
+    event_log.checkpoint()
+
+store.on_flush = after_flush
+metrics.counter('pika_storage_flush_errors_total', "Failed storage flushes", fn=lambda: store.flush_errors)
+metrics.counter('pika_storage_written_bytes_total', "Bytes written by storage flushes, estimated from row sizes with sqlite",
+                fn=lambda: store.bytes_written)
+metrics.counter('pika_storage_dropped_rows_total', "Entries skipped because they can't be stored",
+                fn=lambda: store.rows_dropped)
+metrics.gauge('pika_storage_pending', "Changed entries waiting for the next flush", fn=lambda: len(store.dirty))
+metrics.counter('pika_event_log_events_total', "Events written to the event log", fn=lambda: event_log.events_written)
+metrics.counter('pika_event_log_batches_total', "Batched, fsynced event log writes", fn=lambda: event_log.batches)
+metrics.counter('pika_event_log_write_errors_total', "Failed event log writes", fn=lambda: event_log.write_errors)
 
-def add_sp(guild_id, user_id, sp):
-    guild_str = str(guild_id)
+# Load data
+def load_data():
+    data = store.load(owns_guild)
+    for section, mapping in (('sp_data', sp_data), ('role_permissions', role_permissions),
+                             ('bracket_roles', bracket_roles), ('tournaments', tournament_snapshots),
+                             ('hoster_registrations', hoster_registrations)):
+        # Guilds on other workers' shards are theirs to load, store.load() left them out
+        mapping.update(data.get(section, {}))
+
+    # Changes logged after the last flushes may not have been written before a crash
+    events = event_log.open()
+    touched = replay([event for event in events if event.get('guild') is None or owns_guild(event['guild'])],
+                     sp_data, tournament_snapshots)
+    for section, guild in touched:
+        save_data(section, guild)
+    if touched:
+        print(f"✅ Replayed {len(events)} logged events over the stored data")
+
+def save_data(section, guild_id, key=None):
+    """Mark data as changed, it is written on the next flush"""
+    store.mark_dirty(section, guild_id, key)
+
+def add_sp(guild_id, user_id, sp, **details):
+    """Award SP, the details (tournament, place) are logged with it"""
     user_str = str(user_id)
+    apply_sp_changes(guild_id, {user_str: sp_data.get(str(guild_id), {}).get(user_str, 0) + sp},
+                     'award', points=sp, **details)
 
-    if guild_str not in sp_data:
-        sp_data[guild_str] = {}
-
-    if user_str not in sp_data[guild_str]:
-        sp_data[guild_str][user_str] = 0
+def apply_sp_changes(guild_id, new_values, event='sp', **details):
+    """Set {user_id: sp} for a guild. Nothing awaits in here, so no one sees a half applied batch."""
+    event_log.append(event, guild_id, sp=new_values, **details)
+    guild_str = str(guild_id)
+    guild_sp = sp_data.setdefault(guild_str, {})
+    leaderboard = leaderboards.get(guild_str)
+    for user_str, sp in new_values.items():
+        guild_sp[user_str] = sp
+        save_data('sp_data', guild_str, user_str)
+        if leaderboard is not None:
+            leaderboard.update(user_str, sp)
+
+SP_MAX = 2 ** 63 - 1  # storage and the season archive keep SP as signed 64-bit integers
+
+def plan_sp_changes(guild_id, rows, mode):
+    """Turn [(user_id, amount)] into {user_id: new sp} for 'add' or 'set', plus the errors that block it"""
+    current = sp_data.get(str(guild_id), {})
+    new_values = {}
+    for user_str, amount in rows:
+        if mode == 'add':
+            new_values[user_str] = new_values.get(user_str, current.get(user_str, 0)) + amount
+        else:
+            new_values[user_str] = amount
+    errors = [f"<@{user_str}> would end up with {sp} SP" for user_str, sp in new_values.items() if not 0 <= sp <= SP_MAX]
+    return new_values, errors
 
-    sp_data[guild_str][user_str] += sp
-    save_data()
+def can_manage_sp(member, guild_id):
+    return member.guild_permissions.administrator or can(member, guild_id, ('adr',))
 
-def has_permission(user, guild_id, permission_type):
-    """Check if user has specific permission type"""
+def get_leaderboard(guild_id):
+    """Get the sorted SP standings for a guild"""
     guild_str = str(guild_id)
-    if guild_str not in role_permissions:
-        return False
+    if guild_str not in leaderboards:
+        leaderboards[guild_str] = Leaderboard(sp_data.get(guild_str, {}))
+    return leaderboards[guild_str]
 
-    if permission_type not in role_permissions[guild_str]:
-        return False
+# Permission types as bits so several can be checked in one pass
+PERMISSION_BITS = {'htr': 1, 'adr': 2, 'tlr': 4}
+compiled_permissions = {}  # {guild_id: {role_id: bitmask}}, built from role_permissions
+permission_cache = {}  # {guild_id: {user_id: (bitmask, expires_at)}}
 
-    user_role_ids = [role.id for role in user.roles]
-    allowed_role_ids = role_permissions[guild_str][permission_type]
+def compile_permissions(guild_id):
+    """Turn a guild's role_permissions into a role ID -> bitmask lookup"""
+    guild_str = str(guild_id)
+    roles = {}
+    for permission_type, role_ids in role_permissions.get(guild_str, {}).items():
+        bit = PERMISSION_BITS.get(permission_type, 0)
+        for role_id in role_ids:
+            roles[role_id] = roles.get(role_id, 0) | bit
+    compiled_permissions[guild_str] = roles
+    permission_cache.pop(guild_str, None)
+    return roles
+
+def invalidate_permissions(guild_id, user_id=None):
+    """Forget cached decisions for a guild, or for one member of it"""
+    guild_str = str(guild_id)
+    if user_id is None:
+        permission_cache.pop(guild_str, None)
+    else:
+        permission_cache.get(guild_str, {}).pop(user_id, None)
 
-    return any(role_id in allowed_role_ids for role_id in user_role_ids)
+def permission_mask(user, guild_id):
+    guild_str = str(guild_id)
+    roles = compiled_permissions.get(guild_str)
+    if roles is None:
+        roles = compile_permissions(guild_str)
+
+    guild_cache = permission_cache.setdefault(guild_str, {})
+    now = time.monotonic()
+    cached = guild_cache.get(user.id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    mask = 0
+    if roles:
+        for role in user.roles:
+            mask |= roles.get(role.id, 0)
+    guild_cache[user.id] = (mask, now + PERMISSION_CACHE_TTL)
+    return mask
+
+def can(user, guild_id, permission_types, manage_channels=False):
+    """Check if user has any of the permission types, or Manage Channels if allowed"""
+    wanted = 0
+    for permission_type in permission_types:
+        wanted |= PERMISSION_BITS[permission_type]
+    if permission_mask(user, guild_id) & wanted:
+        return True
+    return manage_channels and user.guild_permissions.manage_channels
 
 @bot.event
 async def on_ready():
     print(f"✅ Bot is online as {bot.user}")
-    load_data()
 
     # Add persistent views for buttons to work after restart
-    bot.add_view(TournamentView())
+    bot.add_view(LegacyTournamentView())
     bot.add_view(TournamentConfigView(None))
     bot.add_view(HosterRegistrationView())
+    bot.add_dynamic_items(TournamentButton, ReportResultsButton)
 
     print("🔧 Bot is ready and all systems operational!")
 
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        invalidate_permissions(after.guild.id, after.id)
+    if member_cache.get(after.guild.id, after.id) is not None:
+        member_cache.remember(after)
+    if before.nick != after.nick or before.display_name != after.display_name:
+        display_names.forget(after.guild.id, after.id)
+
+@bot.event
+async def on_user_update(before, after):
+    if before.name != after.name or before.global_name != after.global_name:
+        display_names.forget_user(after.id)
+
+@bot.event
+async def on_raw_member_remove(payload):
+    member_cache.forget(payload.guild_id, payload.user.id)
+
+@bot.listen()
+async def on_interaction(interaction):
+    if isinstance(interaction.user, discord.Member):
+        member_cache.remember(interaction.user)
+
+@bot.listen()
+async def on_command(ctx):
+    if isinstance(ctx.author, discord.Member):
+        member_cache.remember(ctx.author)
+
+@bot.event
+async def on_guild_role_delete(role):
+    invalidate_permissions(role.guild.id)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.permissions != after.permissions:
+        invalidate_permissions(after.guild.id)
+
 class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
     def __init__(self, target_channel):
         super().__init__()
@@ -159,6 +820,7 @@ class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
         max_length=50
     )
 
+    @tracer.traced
     async def on_submit(self, interaction: discord.Interaction):
         try:
             # Validate target channel
@@ -175,8 +837,8 @@ class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
             mode = mode_players_parts[0]
             max_players = int(mode_players_parts[1])
 
-            if max_players not in [2, 4, 8, 16, 32]:
-                await interaction.response.send_message("❌ Max players must be 2, 4, 8, 16 or 32!", ephemeral=True)
+            if not 2 <= max_players <= MAX_PLAYERS:
+                await interaction.response.send_message(f"❌ Max players must be between 2 and {MAX_PLAYERS}!", ephemeral=True)
                 return
         except ValueError:
             await interaction.response.send_message("❌ Invalid format! Use: mode maxplayers (e.g., '1v1 8')", ephemeral=True)
@@ -186,54 +848,55 @@ class TournamentConfigModal(discord.ui.Modal, title="Tournament Configuration"):
             await interaction.response.send_message("❌ An error occurred. Please try again.", ephemeral=True)
             return
 
-        # Get server-specific tournament and reset it
-        tournament = get_tournament(interaction.guild.id)
-        tournament.__init__()
-        tournament.max_players = max_players
-        tournament.channel = self.target_channel
-        tournament.target_channel = self.target_channel
-        tournament.title = self.title_field.value
-        tournament.map = self.map_field.value
-        tournament.abilities = self.abilities_field.value
-        tournament.prize = self.prize_field.value
-        tournament.players = []
-        tournament.eliminated = []
-        tournament.active = False
-
-        embed = discord.Embed(title=f"🏆 {tournament.title}", color=0x00ff00)
-        embed.add_field(name="<:map:1409924163346370560> Map", value=tournament.map, inline=True)
-        embed.add_field(name="<:abilities:1402690411759407185> Abilities", value=tournament.abilities, inline=True)
-        embed.add_field(name="🎮 Mode", value=mode, inline=True)
-        embed.add_field(name="<:LotsOfGems:1383151614940151908> Prize", value=tournament.prize, inline=True)
-        embed.add_field(name="<:TrioIcon:1402690815771541685> Max Players", value=str(max_players), inline=True)
-
-        # Enhanced Stumble Guys rules with updated emojis
-        rules_text = (
-            "🔹 **NO TEAMING** - Teams are only allowed in designated team modes\n"
-            "🔸 **NO GRIEFING** - Don't intentionally sabotage other players\n"
-            "🔹 **NO EXPLOITING** - Use of glitches or exploits will result in disqualification\n"
-            "🔸 **FAIR PLAY** - Respect all players and play honorably\n"
-            "🔹 **NO RAGE QUITTING** - Leaving mid-match counts as a forfeit\n"
-            "🔸 **FOLLOW HOST** - Listen to tournament host instructions\n"
-            "🔹 **NO TOXICITY** - Keep chat friendly and respectful\n"
-            "🔸 **BE READY** - Join matches promptly when called\n"
-            "🔹 **NO ALTS** - One account per player only"
-        )
+        # Acknowledged before waiting for the lock, Discord gives up on interactions after 3 seconds
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        async with tournament_lock(interaction.guild.id):
+            # One tournament per channel, so commands there know which one they are about
+            if any(self.target_channel.id in other.channel_ids() for other in guild_tournaments(interaction.guild.id)):
+                return await interaction.followup.send(f"❌ {self.target_channel.mention} already has a tournament. Finish or cancel it first.", ephemeral=True)
+
+            tournament = Tournament(interaction.id)
+            tournament.max_players = max_players
+            tournament.channel = self.target_channel
+            tournament.target_channel = self.target_channel
+            tournament.title = self.title_field.value
+            tournament.map = self.map_field.value
+            tournament.abilities = self.abilities_field.value
+            tournament.prize = self.prize_field.value
+            tournament.transition(OPEN)
+
+            embed = discord.Embed(title=f"🏆 {tournament.title}", color=0x00ff00)
+            embed.add_field(name="<:map:1409924163346370560> Map", value=tournament.map, inline=True)
+            embed.add_field(name="<:abilities:1402690411759407185> Abilities", value=tournament.abilities, inline=True)
+            embed.add_field(name="🎮 Mode", value=mode, inline=True)
+            embed.add_field(name="<:LotsOfGems:1383151614940151908> Prize", value=tournament.prize, inline=True)
+            embed.add_field(name="<:TrioIcon:1402690815771541685> Max Players", value=str(max_players), inline=True)
+
+            # Enhanced Stumble Guys rules with updated emojis
+            rules_text = (
+                "🔹 **NO TEAMING** - Teams are only allowed in designated team modes\n"
+                "🔸 **NO GRIEFING** - Don't intentionally sabotage other players\n"
+                "🔹 **NO EXPLOITING** - Use of glitches or exploits will result in disqualification\n"
+                "🔸 **FAIR PLAY** - Respect all players and play honorably\n"
+                "🔹 **NO RAGE QUITTING** - Leaving mid-match counts as a forfeit\n"
+                "🔸 **FOLLOW HOST** - Listen to tournament host instructions\n"
+                "🔹 **NO TOXICITY** - Keep chat friendly and respectful\n"
+                "🔸 **BE READY** - Join matches promptly when called\n"
+                "🔹 **NO ALTS** - One account per player only"
+            )
 
-        embed.add_field(name="<:notr:1409923674387251280> **Stumble Guys Tournament Rules**", value=rules_text, inline=False)
+            embed.add_field(name="<:notr:1409923674387251280> **Stumble Guys Tournament Rules**", value=rules_text, inline=False)
 
-        view = TournamentView()
-        # Update the participant count button to show correct max players
-        for item in view.children:
-            if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
-                item.label = f"0/{max_players}"
-                break
+            view = TournamentView(tournament.id, f"0/{max_players}")
 
-        # Send tournament message
-        tournament.message = await self.target_channel.send(embed=embed, view=view)
+            # Send tournament message
+            tournament.message = await self.target_channel.send(embed=embed, view=view)
+            add_tournament(interaction.guild.id, tournament)
+            log_tournament('create', interaction.guild.id, tournament, snapshot=tournament.to_snapshot(),
+                           by=interaction.user.id)
 
         # Respond with success
-        await interaction.response.send_message("✅ Tournament created successfully!", ephemeral=True)
+        await interaction.followup.send("✅ Tournament created successfully!", ephemeral=True)
 
         print(f"✅ Tournament created: {max_players} max players, Map: {tournament.map}")
 
@@ -243,6 +906,7 @@ class TournamentConfigView(discord.ui.View):
         self.target_channel = target_channel
 
     @discord.ui.button(label="Set Tournament", style=discord.ButtonStyle.primary, custom_id="set_tournament_config")
+    @tracer.traced
     async def set_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             # Use the channel where the interaction happened if no target channel is set
@@ -264,150 +928,228 @@ class TournamentConfigView(discord.ui.View):
             except Exception as follow_error:
                 print(f"Failed to send error message: {follow_error}")
 
-class TournamentView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=None)
+# Pending participant counter edits, one per registration message
+pending_count_edits = {}  # {message_id: asyncio.Task}
 
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return True
+def schedule_count_update(tournament, message):
+    """Coalesce participant counter edits so a burst of clicks is one message edit"""
+    if message.id not in pending_count_edits:
+        pending_count_edits[message.id] = asyncio.create_task(apply_count_update(tournament, message))
 
-    @discord.ui.button(label="Register", style=discord.ButtonStyle.green, custom_id="tournament_register")
-    async def register_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        try:
-            tournament = get_tournament(interaction.guild.id)
+async def apply_count_update(tournament, message):
+    await asyncio.sleep(REGISTRATION_EDIT_DELAY)
+    # Clicks from here on schedule a new edit
+    pending_count_edits.pop(message.id, None)
+    try:
+        await message.edit(view=TournamentView(tournament.id, f"{len(tournament.players)}/{tournament.max_players}"))
+    except Exception as e:
+        print(f"Error updating participant count: {e}")
 
+async def register_player(interaction, tournament_id):
+    try:
+        # Acknowledge first, the lock may be held across a slow bracket edit
+        await interaction.response.defer()
+        async with locked_tournament(interaction.guild.id, tournament_id) as tournament:
             # Check tournament state
-            if tournament.max_players == 0:
-                return await interaction.response.send_message("❌ No tournament has been created yet.", ephemeral=True)
+            if tournament is None:
+                return await interaction.followup.send("❌ This tournament is over or was cancelled.", ephemeral=True)
             if tournament.active:
-                return await interaction.response.send_message("⚠️ Tournament already started.", ephemeral=True)
-            if interaction.user in tournament.players:
-                return await interaction.response.send_message("❌ You are already registered.", ephemeral=True)
+                return await interaction.followup.send("⚠️ Tournament already started.", ephemeral=True)
+            if tournament.has_player(interaction.user.id):
+                return await interaction.followup.send("❌ You are already registered.", ephemeral=True)
 
             # Check if there's space
             if len(tournament.players) >= tournament.max_players:
-                return await interaction.response.send_message("❌ Tournament is full.", ephemeral=True)
+                return await interaction.followup.send("❌ Tournament is full.", ephemeral=True)
 
-            tournament.players.append(interaction.user)
+            player = PlayerRef.from_member(interaction.user)
+            tournament.add_player(player)
+            save_tournament(interaction.guild.id, tournament)
+            log_tournament('register', interaction.guild.id, tournament, player=[player.id, player.name, False])
 
-            for item in self.children:
-                if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
-                    item.label = f"{len(tournament.players)}/{tournament.max_players}"
-                    break
+            # The counter is updated once the burst settles
+            schedule_count_update(tournament, interaction.message)
 
-            await interaction.response.edit_message(view=self)
-            await interaction.followup.send(f"✅ {interaction.user.display_name} registered! ({len(tournament.players)}/{tournament.max_players})", ephemeral=True)
+    except Exception as e:
+        print(f"Error in register_button: {e}")
+        try:
+            if not interaction.response.is_done():
+                await interaction.response.send_message("❌ An error occurred. Please try again.", ephemeral=True)
+            else:
+                await interaction.followup.send("❌ An error occurred. Please try again.", ephemeral=True)
+        except Exception as follow_error:
+            print(f"Failed to send error message: {follow_error}")
+
+async def unregister_player(interaction, tournament_id):
+    try:
+        # Acknowledge first, the lock may be held across a slow bracket edit
+        await interaction.response.defer()
+        async with locked_tournament(interaction.guild.id, tournament_id) as tournament:
+            if tournament is None:
+                return await interaction.followup.send("❌ This tournament is over or was cancelled.", ephemeral=True)
+            if tournament.active:
+                return await interaction.followup.send("⚠️ Tournament already started.", ephemeral=True)
+            if not tournament.has_player(interaction.user.id):
+                return await interaction.followup.send("❌ You are not registered.", ephemeral=True)
 
-        except Exception as e:
-            print(f"Error in register_button: {e}")
-            try:
-                if not interaction.response.is_done():
-                    await interaction.response.send_message("❌ An error occurred. Please try again.", ephemeral=True)
-                else:
-                    await interaction.followup.send("❌ An error occurred. Please try again.", ephemeral=True)
-            except Exception as follow_error:
-                print(f"Failed to send error message: {follow_error}")
+            tournament.remove_player(interaction.user.id)
+            save_tournament(interaction.guild.id, tournament)
+            log_tournament('unregister', interaction.guild.id, tournament, user=interaction.user.id)
 
-    @discord.ui.button(label="Unregister", style=discord.ButtonStyle.red, custom_id="tournament_unregister")
-    async def unregister_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+            schedule_count_update(tournament, interaction.message)
+
+    except Exception as e:
+        print(f"Error in unregister_button: {e}")
         try:
-            tournament = get_tournament(interaction.guild.id)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("❌ An error occurred. Please try again.", ephemeral=True)
+            else:
+                await interaction.followup.send("❌ An error occurred. Please try again.", ephemeral=True)
+        except Exception as follow_error:
+            print(f"Failed to send error message: {follow_error}")
+
+async def start_from_button(interaction, tournament_id):
+    try:
+        if not can(interaction.user, interaction.guild.id, ('tlr',), manage_channels=True):
+            return await interaction.response.send_message("❌ You don't have permission to start tournaments.", ephemeral=True)
 
-            if tournament.max_players == 0:
-                return await interaction.response.send_message("❌ No tournament has been created yet.", ephemeral=True)
-            if tournament.active:
-                return await interaction.response.send_message("⚠️ Tournament already started.", ephemeral=True)
-            if interaction.user not in tournament.players:
-                return await interaction.response.send_message("❌ You are not registered.", ephemeral=True)
+        # Acknowledge first, the lock may be held across a slow bracket edit
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        async with locked_tournament(interaction.guild.id, tournament_id) as tournament:
+            if tournament is None:
+                return await interaction.followup.send("❌ This tournament is over or was cancelled.", ephemeral=True)
 
-            tournament.players.remove(interaction.user)
+            if tournament.active:
+                return await interaction.followup.send("❌ Tournament already started.", ephemeral=True)
 
-            for item in self.children:
-                if hasattr(item, 'custom_id') and item.custom_id == "participant_count":
-                    item.label = f"{len(tournament.players)}/{tournament.max_players}"
-                    break
+            # Allow tournament to start even without max players
+            if len(tournament.players) < 2:
+                return await interaction.followup.send("❌ Not enough players to start tournament (minimum 2 players).", ephemeral=True)
 
-            await interaction.response.edit_message(view=self)
-            await interaction.followup.send(f"✅ {interaction.user.display_name} unregistered! ({len(tournament.players)}/{tournament.max_players})", ephemeral=True)
+            tournament.shuffle_players()
+            tournament.transition(RUNNING)
+            tournament.start_format('single')
 
-        except Exception as e:
-            print(f"Error in unregister_button: {e}")
+            tournament.renderer.render_round(tournament, interaction.guild.id)
             try:
-                if not interaction.response.is_done():
-                    await interaction.response.send_message("❌ An error occurred. Please try again.", ephemeral=True)
-                else:
-                    await interaction.followup.send("❌ An error occurred. Please try again.", ephemeral=True)
-            except Exception as follow_error:
-                print(f"Failed to send error message: {follow_error}")
-
-    @discord.ui.button(label="0/0", style=discord.ButtonStyle.secondary, disabled=True, custom_id="participant_count")
-    async def participant_count(self, interaction: discord.Interaction, button: discord.ui.Button):
-        pass
+                tournament.message = await tournament.renderer.send(tournament, interaction.channel)
+            except Exception as e:
+                print(f"Error posting round 1: {e}")
+            save_tournament(interaction.guild.id, tournament)
+            log_start(interaction.guild.id, tournament)
+            await interaction.followup.send("✅ Tournament started successfully!", ephemeral=True)
 
-    @discord.ui.button(label="🚀 Start Tournament", style=discord.ButtonStyle.primary, custom_id="start_tournament")
-    async def start_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
+    except Exception as e:
+        print(f"Error in start_tournament: {e}")
         try:
-            tournament = get_tournament(interaction.guild.id)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("❌ An error occurred while starting the tournament.", ephemeral=True)
+            else:
+                await interaction.followup.send("❌ An error occurred while starting the tournament.", ephemeral=True)
+        except Exception as follow_error:
+            print(f"Failed to send error message: {follow_error}")
+
+class TournamentButton(discord.ui.DynamicItem[discord.ui.Button], template=r"tournament:(?P<action>register|unregister|start):(?P<tournament_id>[0-9]+)"):
+    """Registration message button, the custom_id carries the tournament ID so no lookup by guild is needed"""
+
+    BUTTONS = {
+        'register': ("Register", discord.ButtonStyle.green, register_player),
+        'unregister': ("Unregister", discord.ButtonStyle.red, unregister_player),
+        'start': ("🚀 Start Tournament", discord.ButtonStyle.primary, start_from_button),
+    }
 
-            if not has_permission(interaction.user, interaction.guild.id, 'tlr') and not interaction.user.guild_permissions.manage_channels:
-                return await interaction.response.send_message("❌ You don't have permission to start tournaments.", ephemeral=True)
+    def __init__(self, action, tournament_id):
+        label, style, _ = self.BUTTONS[action]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"tournament:{action}:{tournament_id}"))
+        self.action = action
+        self.tournament_id = tournament_id
 
-            if tournament.max_players == 0:
-                return await interaction.response.send_message("❌ No tournament has been created yet.", ephemeral=True)
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['action'], int(match['tournament_id']))
 
-            if tournament.active:
-                return await interaction.response.send_message("❌ Tournament already started.", ephemeral=True)
+    @tracer.traced
+    async def callback(self, interaction: discord.Interaction):
+        await self.BUTTONS[self.action][2](interaction, self.tournament_id)
 
-            # Allow tournament to start even without max players
-            if len(tournament.players) < 2:
-                return await interaction.response.send_message("❌ Not enough players to start tournament (minimum 2 players).", ephemeral=True)
+class TournamentView(discord.ui.View):
+    def __init__(self, tournament_id, count_label="0/0"):
+        super().__init__(timeout=None)
+        self.add_item(TournamentButton('register', tournament_id))
+        self.add_item(TournamentButton('unregister', tournament_id))
+        self.add_item(discord.ui.Button(label=count_label, style=discord.ButtonStyle.secondary, disabled=True,
+                                        custom_id=f"tournament:count:{tournament_id}"))
+        self.add_item(TournamentButton('start', tournament_id))
 
-            await interaction.response.send_message("🚀 Starting tournament...", ephemeral=True)
+class LegacyTournamentView(discord.ui.View):
+    """Buttons of messages posted before custom_ids carried the tournament ID
 
-            # Shuffle players
-            random.shuffle(tournament.players)
+    Those tournaments were never stored, so the buttons only explain that.
+    """
 
-            tournament.active = True
-            tournament.results = []
-            tournament.rounds = []
+    def __init__(self):
+        super().__init__(timeout=None)
 
-            round_pairs = [(tournament.players[i], tournament.players[i+1]) for i in range(0, len(tournament.players), 2)]
-            tournament.rounds.append(round_pairs)
+    async def outdated(self, interaction):
+        await interaction.response.send_message("❌ This tournament predates the bot's upgrade and can't be joined or started anymore. "
+                                                "Ask a host to create a new one with `!create #channel`.", ephemeral=True)
 
-            embed = discord.Embed(
-                title=f"🏆 {tournament.title} - Round 1",
-                description=f"**Map:** {tournament.map}\n**Abilities:** {tournament.abilities}",
-                color=0x3498db
-            )
+    @discord.ui.button(label="Register", style=discord.ButtonStyle.green, custom_id="tournament_register")
+    async def register_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.outdated(interaction)
 
-            for i, match in enumerate(round_pairs, 1):
-                a, b = match
-                player_a = get_player_display_name(a, interaction.guild.id)
-                player_b = get_player_display_name(b, interaction.guild.id)
-                embed.add_field(
-                    name=f"⚔️ Match {i}",
-                    value=f"**{player_a}** <:VS:1402690899485655201> **{player_b}**\n<:Crown:1409926966236283012> Winner: *Waiting...*",
-                    inline=False
-                )
-
-            embed.set_footer(text="Use !winner @player to record match results")
-
-            # Create a new view without the registration buttons for active tournament
-            active_tournament_view = discord.ui.View()
-            tournament.message = await interaction.channel.send(embed=embed, view=active_tournament_view)
-            await interaction.followup.send("✅ Tournament started successfully!", ephemeral=True)
+    @discord.ui.button(label="Unregister", style=discord.ButtonStyle.red, custom_id="tournament_unregister")
+    async def unregister_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.outdated(interaction)
 
-        except Exception as e:
-            print(f"Error in start_tournament: {e}")
-            try:
-                if not interaction.response.is_done():
-                    await interaction.response.send_message("❌ An error occurred while starting the tournament.", ephemeral=True)
-                else:
-                    await interaction.followup.send("❌ An error occurred while starting the tournament.", ephemeral=True)
-            except Exception as follow_error:
-                print(f"Failed to send error message: {follow_error}")
+    @discord.ui.button(label="🚀 Start Tournament", style=discord.ButtonStyle.primary, custom_id="start_tournament")
+    async def start_tournament(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.outdated(interaction)
+
+def get_roster(guild_id, message_id):
+    """Hoster roster of a registration message, None if there is none"""
+    guild_rosters = hoster_rosters.setdefault(guild_id, {})
+    if message_id not in guild_rosters:
+        snapshot = hoster_registrations.get(str(guild_id), {}).get(str(message_id))
+        if not snapshot:
+            return None
+        guild_rosters[message_id] = HosterRoster.from_snapshot(snapshot)
+    return guild_rosters[message_id]
+
+def save_roster(guild_id, message_id, roster):
+    """Persist a roster, closed ones are dropped since their message is final"""
+    guild_str = str(guild_id)
+    if roster.active:
+        hoster_registrations.setdefault(guild_str, {})[str(message_id)] = roster.to_snapshot()
+        hoster_rosters.setdefault(guild_id, {})[message_id] = roster
+    else:
+        hoster_registrations.get(guild_str, {}).pop(str(message_id), None)
+        hoster_rosters.get(guild_id, {}).pop(message_id, None)
+    save_data('hoster_registrations', guild_str, message_id)
+
+def hoster_embed(roster):
+    """Registration embed, built once per change from the roster's cached list"""
+    if roster.active:
+        embed = discord.Embed(
+            title="🎯 Hoster Registration",
+            description="Here the hosters will register to host tournaments!",
+            color=0x00ff00
+        )
+        embed.add_field(name="Hosters registered:", value=roster.listing() or "None yet", inline=False)
+        embed.add_field(name="Slots:", value=f"{len(roster)}/{roster.max_hosters}", inline=True)
+    else:
+        embed = discord.Embed(
+            title="🎯 Hoster Registration - CLOSED",
+            description="Hoster registration has been closed by a moderator.",
+            color=0xff0000
+        )
+        embed.add_field(name="Final Hosters registered:", value=roster.listing() or "None", inline=False)
+        embed.add_field(name="Final Slots:", value=f"{len(roster)}/{roster.max_hosters}", inline=True)
+    return embed
 
 class HosterRegistrationView(discord.ui.View):
+    """Buttons of a hoster registration message, the message ID identifies the roster"""
+
     def __init__(self):
         super().__init__(timeout=None)
 
@@ -415,112 +1157,146 @@ class HosterRegistrationView(discord.ui.View):
         return True
 
     @discord.ui.button(label="Register", style=discord.ButtonStyle.green, custom_id="hoster_register")
+    @tracer.traced
     async def register_hoster(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not host_registrations['active']:
+        roster = get_roster(interaction.guild.id, interaction.message.id)
+        if roster is None or not roster.active:
             return await interaction.response.send_message("❌ Hoster registration is not active.", ephemeral=True)
 
-        if interaction.user in host_registrations['hosters']:
+        if interaction.user.id in roster:
             return await interaction.response.send_message("❌ You are already registered as a hoster.", ephemeral=True)
 
-        if len(host_registrations['hosters']) >= host_registrations['max_hosters']:
+        if roster.is_full():
             return await interaction.response.send_message("❌ Maximum number of hosters reached.", ephemeral=True)
 
-        host_registrations['hosters'].append(interaction.user)
+        roster.add(interaction.user.id, interaction.user.display_name)
+        save_roster(interaction.guild.id, interaction.message.id, roster)
 
-        # Update the embed
-        embed = discord.Embed(
-            title="🎯 Hoster Registration",
-            description="Here the hosters will register to host tournaments!",
-            color=0x00ff00
-        )
-
-        if host_registrations['hosters']:
-            hoster_list = ""
-            for i, hoster in enumerate(host_registrations['hosters'], 1):
-                hoster_name = hoster.nick if hoster.nick else hoster.display_name
-                hoster_list += f"{i}. {hoster_name}\n"
-            embed.add_field(name="Hosters registered:", value=hoster_list, inline=False)
-        else:
-            embed.add_field(name="Hosters registered:", value="None yet", inline=False)
-
-        embed.add_field(name="Slots:", value=f"{len(host_registrations['hosters'])}/{host_registrations['max_hosters']}", inline=True)
-
-        await interaction.response.edit_message(embed=embed, view=self)
+        await interaction.response.edit_message(embed=hoster_embed(roster), view=self)
         await interaction.followup.send(f"✅ {interaction.user.display_name} registered as a hoster!", ephemeral=True)
 
     @discord.ui.button(label="Unregister", style=discord.ButtonStyle.red, custom_id="hoster_unregister")
+    @tracer.traced
     async def unregister_hoster(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not host_registrations['active']:
+        roster = get_roster(interaction.guild.id, interaction.message.id)
+        if roster is None or not roster.active:
             return await interaction.response.send_message("❌ Hoster registration is not active.", ephemeral=True)
 
-        if interaction.user not in host_registrations['hosters']:
+        if interaction.user.id not in roster:
             return await interaction.response.send_message("❌ You are not registered as a hoster.", ephemeral=True)
 
-        host_registrations['hosters'].remove(interaction.user)
-
-        # Update the embed
-        embed = discord.Embed(
-            title="🎯 Hoster Registration",
-            description="Here the hosters will register to host tournaments!",
-            color=0x00ff00
-        )
-
-        if host_registrations['hosters']:
-            hoster_list = ""
-            for i, hoster in enumerate(host_registrations['hosters'], 1):
-                hoster_name = hoster.nick if hoster.nick else hoster.display_name
-                hoster_list += f"{i}. {hoster_name}\n"
-            embed.add_field(name="Hosters registered:", value=hoster_list, inline=False)
-        else:
-            embed.add_field(name="Hosters registered:", value="None yet", inline=False)
-
-        embed.add_field(name="Slots:", value=f"{len(host_registrations['hosters'])}/{host_registrations['max_hosters']}", inline=True)
+        roster.remove(interaction.user.id)
+        save_roster(interaction.guild.id, interaction.message.id, roster)
 
-        await interaction.response.edit_message(embed=embed, view=self)
+        await interaction.response.edit_message(embed=hoster_embed(roster), view=self)
         await interaction.followup.send(f"✅ {interaction.user.display_name} unregistered from hosting.", ephemeral=True)
 
     @discord.ui.button(label="End Register", style=discord.ButtonStyle.secondary, custom_id="end_hoster_register")
+    @tracer.traced
     async def end_registration(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not has_permission(interaction.user, interaction.guild.id, 'tlr') and not interaction.user.guild_permissions.manage_channels:
+        if not can(interaction.user, interaction.guild.id, ('tlr',), manage_channels=True):
             return await interaction.response.send_message("❌ You don't have permission to end registration.", ephemeral=True)
 
-        host_registrations['active'] = False
+        roster = get_roster(interaction.guild.id, interaction.message.id)
+        if roster is None or not roster.active:
+            return await interaction.response.send_message("❌ Hoster registration is not active.", ephemeral=True)
 
-        # Keep the existing embed but disable all buttons
-        embed = discord.Embed(
-            title="🎯 Hoster Registration - CLOSED",
-            description="Hoster registration has been closed by a moderator.",
-            color=0xff0000
-        )
+        roster.close()
+        save_roster(interaction.guild.id, interaction.message.id, roster)
 
-        if host_registrations['hosters']:
-            hoster_list = ""
-            for i, hoster in enumerate(host_registrations['hosters'], 1):
-                hoster_name = hoster.nick if hoster.nick else hoster.display_name
-                hoster_list += f"{i}. {hoster_name}\n"
-            embed.add_field(name="Final Hosters registered:", value=hoster_list, inline=False)
-        else:
-            embed.add_field(name="Final Hosters registered:", value="None", inline=False)
+        # Disable all buttons, on a copy since this view instance serves every registration message
+        view = HosterRegistrationView()
+        for item in view.children:
+            item.disabled = True
 
-        embed.add_field(name="Final Slots:", value=f"{len(host_registrations['hosters'])}/{host_registrations['max_hosters']}", inline=True)
+        await interaction.response.edit_message(embed=hoster_embed(roster), view=view)
 
-        # Disable all buttons
-        for item in self.children:
-            item.disabled = True
+async def open_result_entry(interaction, tournament_id):
+    if not can(interaction.user, interaction.guild.id, ('htr', 'tlr'), manage_channels=True):
+        return await interaction.response.send_message("❌ You don't have permission to set winners.", ephemeral=True)
 
-        await interaction.response.edit_message(embed=embed, view=self)
+    tournament = get_tournament(interaction.guild.id, tournament_id)
+    if tournament is None or not tournament.active:
+        return await interaction.response.send_message("❌ No active tournament.", ephemeral=True)
 
-# Global host registrations
-host_registrations = {
-    'active': False,
-    'max_hosters': 0,
-    'hosters': [],
-    'channel': None,
-    'message': None
-}
+    view = ResultEntryView(tournament, interaction.guild.id)
+    if not view.selects:
+        return await interaction.response.send_message("ℹ️ Every match of this round already has a winner.", ephemeral=True)
+    await interaction.response.send_message(view.prompt, view=view, ephemeral=True)
+
+class ReportResultsButton(discord.ui.DynamicItem[discord.ui.Button], template=r"report_results:(?P<tournament_id>[0-9]+)"):
+    """Bracket message button, opens the result entry menu of its tournament"""
+
+    def __init__(self, tournament_id):
+        super().__init__(discord.ui.Button(label="📝 Report Results", style=discord.ButtonStyle.primary,
+                                           custom_id=f"report_results:{tournament_id}"))
+        self.tournament_id = tournament_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['tournament_id']))
 
-# Bracket roles data
-bracket_roles = {}
+    @tracer.traced
+    async def callback(self, interaction: discord.Interaction):
+        await open_result_entry(interaction, self.tournament_id)
+
+class BracketView(discord.ui.View):
+    """Buttons under the bracket message of the current round"""
+
+    def __init__(self, tournament_id):
+        super().__init__(timeout=None)
+        self.add_item(ReportResultsButton(tournament_id))
+
+class ResultEntryView(discord.ui.View):
+    """Pick the winners of several matches, then record them in one go"""
+
+    MATCHES_PER_SELECT = 12  # two options per match, a select holds 25
+    MAX_SELECTS = 4  # the last row is for the buttons
+
+    def __init__(self, tournament, guild_id):
+        super().__init__(timeout=300)
+        self.tournament = tournament
+        self.round_number = len(tournament.rounds)
+        self.selects = []
+
+        current_round = tournament.rounds[-1]
+        pending = [i for i in range(len(current_round)) if current_round.winner(i) == PENDING]
+        shown = pending[:self.MATCHES_PER_SELECT * self.MAX_SELECTS]
+        for row, start in enumerate(range(0, len(shown), self.MATCHES_PER_SELECT)):
+            matches = shown[start:start + self.MATCHES_PER_SELECT]
+            options = []
+            for match_index in matches:
+                for player in tournament.match_players(match_index)[:2]:
+                    name = get_player_display_name(player, guild_id)
+                    options.append(discord.SelectOption(label=f"Match {match_index + 1}: {name}"[:100], value=str(player.id)))
+            select = discord.ui.Select(placeholder=f"Winners of matches {matches[0] + 1}-{matches[-1] + 1}",
+                                       min_values=0, max_values=len(matches), options=options, row=row)
+            select.callback = self.acknowledge
+            self.add_item(select)
+            self.selects.append(select)
+
+        self.prompt = "Pick the winners, then press **Record Results**."
+        if len(shown) < len(pending):
+            self.prompt += f"\n{len(pending) - len(shown)} more matches are not listed, use `!winners` for those."
+
+    async def acknowledge(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+
+    @discord.ui.button(label="Record Results", style=discord.ButtonStyle.green, row=4)
+    @tracer.traced
+    async def record(self, interaction: discord.Interaction, button: discord.ui.Button):
+        player_ids = [int(value) for select in self.selects for value in select.values]
+        if not player_ids:
+            return await interaction.response.send_message("❌ Pick at least one winner.", ephemeral=True)
+
+        await interaction.response.defer()
+        async with locked_tournament(interaction.guild.id, self.tournament.id) as tournament:
+            if tournament is not self.tournament or not tournament.active or len(tournament.rounds) != self.round_number:
+                confirmation = "❌ The bracket moved on since this menu was opened, press Report Results again."
+            else:
+                confirmation = await report_results(interaction.guild, interaction.channel, tournament, player_ids)
+        await interaction.edit_original_response(content=confirmation, view=None)
+        self.stop()
 
 @bot.command()
 async def create(ctx, channel: discord.TextChannel):
@@ -529,12 +1305,9 @@ async def create(ctx, channel: discord.TextChannel):
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('tlr',), manage_channels=True):
         return await ctx.send("❌ You don't have permission to create tournaments.", delete_after=5)
 
-    tournament = get_tournament(ctx.guild.id)
-    tournament.target_channel = channel
-
     embed = discord.Embed(
         title="🏆 Tournament Setup",
         description="Press the button to configure the tournament settings.",
@@ -545,72 +1318,202 @@ async def create(ctx, channel: discord.TextChannel):
     await ctx.send(embed=embed, view=view)
 
 @bot.command()
-async def start(ctx):
+async def start(ctx, *options: str):
     try:
         await ctx.message.delete()
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('tlr',), manage_channels=True):
         return await ctx.send("❌ You don't have permission to start tournaments.", delete_after=5)
 
-    tournament = get_tournament(ctx.guild.id)
-
-    if tournament.max_players == 0:
-        return await ctx.send("❌ No tournament has been created yet. Use `!create #channel` first.", delete_after=5)
-
-    if tournament.active:
-        return await ctx.send("❌ Tournament already started.", delete_after=5)
+    async with locked_tournament(ctx.guild.id, channel_id=ctx.channel.id) as tournament:
+        if tournament is None:
+            return await ctx.send(NO_TOURNAMENT_HERE, delete_after=5)
+
+        if tournament.active:
+            return await ctx.send("❌ Tournament already started.", delete_after=5)
+
+        if len(tournament.players) < 2:
+            return await ctx.send("❌ Not enough players to start tournament (minimum 2 players).", delete_after=5)
+
+        # Options in any order: a format (single, double, swiss) and a seeding (random, sp)
+        tournament_format, seeding = 'single', 'random'
+        for option in options:
+            option = option.lower()
+            if option in FORMATS:
+                tournament_format = option
+            elif option in ("random", "sp"):
+                seeding = option
+            else:
+                return await ctx.send(f"❌ Unknown option `{option}`. Use a format ({', '.join(FORMATS)}) and/or a seeding (random, sp), e.g. `!start double sp`.", delete_after=5)
+
+        # Players are ordered by seed, empty bracket slots become byes for the top seeds
+        if seeding == "sp":
+            tournament.seed_players(sp_data.get(str(ctx.guild.id), {}))
+        else:
+            tournament.shuffle_players()
 
-    if len(tournament.players) < 2:
-        return await ctx.send("❌ Not enough players to start tournament (minimum 2 players).", delete_after=5)
+        tournament.transition(RUNNING)
+        tournament.start_format(tournament_format)
 
-    # Add fake players if needed to fill up the tournament
-    players_to_add = tournament.max_players - len(tournament.players)
+        tournament.renderer.render_round(tournament, ctx.guild.id)
+        try:
+            tournament.message = await tournament.renderer.send(tournament, ctx.channel)
+        except Exception as e:
+            print(f"Error posting round 1: {e}")
+        save_tournament(ctx.guild.id, tournament)
+        log_start(ctx.guild.id, tournament)
+
+def result_problem(tournament, status, player_id, match_index, guild_id):
+    """Explain why a reported winner was not recorded"""
+    if status == 'not_found':
+        return f"<@{player_id}> is not in the current round."
+    name = get_player_display_name(tournament.players[tournament.player_index[player_id]], guild_id)
+    if status == 'duplicate':
+        return f"{name} is already recorded as the winner of Match {match_index + 1}."
+    if status == 'conflict':
+        recorded_name = get_player_display_name(tournament.match_players(match_index)[2], guild_id)
+        return f"Match {match_index + 1} already has a winner: {recorded_name}."
+    return f"{name} is reported as a second winner of Match {match_index + 1}."
+
+async def report_results(guild, channel, tournament, player_ids):
+    """Record a batch of match winners all or nothing, returns the confirmation text
+
+    The whole batch is rejected if any winner is not in the round, contradicts
+    a recorded result or shares a match with another winner of the batch.
+    Winners that are already recorded are skipped. The bracket message is
+    edited once for the batch. Call with the guild's tournament lock held.
+    """
+    accepted, rejected = tournament.check_results(player_ids)
+    problems = [result_problem(tournament, *problem, guild.id) for problem in rejected if problem[0] != 'duplicate']
+    if problems:
+        return "❌ No results recorded:\n" + "\n".join(problems)
+    if not accepted:
+        return "ℹ️ " + "\n".join(result_problem(tournament, *problem, guild.id) for problem in rejected)
+
+    names = []
+    for match_index, player_id in accepted:
+        tournament.record_result(player_id)
+        tournament.renderer.update_match(tournament, match_index, guild.id)
+        names.append(get_player_display_name(tournament.players[tournament.player_index[player_id]], guild.id))
+    log_tournament('result', guild.id, tournament, round=len(tournament.rounds),
+                   winners=[[match_index, tournament.player_index[player_id]] for match_index, player_id in accepted])
+
+    # Update current tournament message to show the winners
+    try:
+        await tournament.renderer.sync(tournament)
+    except Exception as e:
+        print(f"Error updating tournament message: {e}")
 
-    if players_to_add > 0:
-        await ctx.send(f"Adding {players_to_add} bot player(s) to fill the tournament...", delete_after=5)
-        # Add fake players as proper objects
-        fake_players_added = []
-        for i in range(players_to_add):
-            fake_name = f"Bot{tournament.fake_count}"
-            fake_id = 761557952975420886 + tournament.fake_count
-            fake_player = FakePlayer(fake_name, fake_id)
-            fake_players_added.append(fake_player)
-            tournament.fake_count += 1
-        tournament.players.extend(fake_players_added)
+    if tournament.round_complete():
+        if tournament.format.finished():
+            await finish_tournament(guild, channel, tournament)
+        else:
+            # Next round comes straight from the bracket
+            tournament.start_next_round()
+            tournament.renderer.render_round(tournament, guild.id)
+            try:
+                tournament.message = await tournament.renderer.send(tournament, channel)
+            except Exception as e:
+                # The round is open either way, the previous bracket message stays the current one
+                print(f"Error posting round {len(tournament.rounds)}: {e}")
+            log_tournament('round', guild.id, tournament, round=len(tournament.rounds), matches=len(tournament.rounds[-1]),
+                           message=[tournament.message.channel.id, tournament.message.id])
+
+    if tournament.state == RUNNING:
+        save_tournament(guild.id, tournament)
+    if len(names) == 1:
+        return f"✅ {names[0]} wins their match!"
+    return f"✅ Recorded {len(names)} results: {', '.join(names)}"
+
+async def finish_tournament(guild, channel, tournament):
+    """Award SP by placement, end the tournament and post the winners embed"""
+    # Placements come from the format, ties share a place
+    placements = [(place, player, PLACEMENT_SP[place])
+                  for place, player in tournament.placements() if place in PLACEMENT_SP]
+
+    for place, player, sp in placements:
+        if not player.is_fake:
+            add_sp(guild.id, player.id, sp, tournament=str(tournament.id), place=place)
+
+    # Done before announcing, a failed announcement must not leave a decided tournament running
+    tournament.transition(FINISHED)
+    end_tournament(guild.id, tournament)
 
-    # Shuffle players
-    random.shuffle(tournament.players)
+    try:
+        await announce_winners(guild, channel, tournament, placements)
+    except Exception as e:
+        print(f"Error announcing tournament winners: {e}")
 
-    tournament.active = True
-    tournament.results = []
-    tournament.rounds = []
+async def announce_winners(guild, channel, tournament, placements):
+    """Post the winners embed of a finished tournament"""
+    winner_data = placements[0][1]
 
-    round_pairs = [(tournament.players[i], tournament.players[i+1]) for i in range(0, len(tournament.players), 2)]
-    tournament.rounds.append(round_pairs)
+    # Create styled tournament winners embed
+    winner_display = get_player_display_name(winner_data, guild.id)
 
     embed = discord.Embed(
-        title=f"🏆 {tournament.title} - Round 1",
-        description=f"**Map:** {tournament.map}\n**Abilities:** {tournament.abilities}",
-        color=0x3498db
+        title="🏆 Tournament Winners!",
+        description=f"Congratulations to **{winner_display}** for winning the\n**{tournament.title}** tournament! 🎉",
+        color=0xffd700
     )
 
-    for i, match in enumerate(round_pairs, 1):
-        a, b = match
-        player_a = get_player_display_name(a, ctx.guild.id)
-        player_b = get_player_display_name(b, ctx.guild.id)
-        embed.add_field(
-            name=f"⚔️ Match {i}",
-            value=f"**{player_a}** <:VS:1402690899485655201> **{player_b}**\n<:Crown:1409926966236283012> Winner: *Waiting...*",
-            inline=False
-        )
+    # Add tournament info with custom emojis
+    embed.add_field(name="<:map:1409924163346370560> Map", value=tournament.map, inline=True)
+    embed.add_field(name="<:abilities:1402690411759407185> Abilities", value=tournament.abilities, inline=True)
+    embed.add_field(name="🎮 Mode", value="1v1", inline=True)
+
+    # Create results text
+    results_display = ""
+    for place, player_obj, sp in placements:
+        if place == 1:
+            emoji = "<:Medal_Gold:1402383868505624576>"
+        elif place == 2:
+            emoji = "<:Medal_Silver:1402383899597869207>"
+        elif place == 3:
+            emoji = "<:Medal_Bronze:1402383923991806063>"
+        elif place == 4:
+            emoji = "4️⃣"
+        else:
+            emoji = "📍"
+
+        player_str = get_player_display_name(player_obj, guild.id)
+        results_display += f"{emoji} {player_str}\n"
+
+    embed.add_field(name="🏆 Final Rankings", value=results_display, inline=False)
+
+    # Add prizes section with SP
+    prize_text = ""
+    for place, player_obj, sp in placements:
+        if place == 1:
+            emoji = "<:Medal_Gold:1402383868505624576>"
+        elif place == 2:
+            emoji = "<:Medal_Silver:1402383899597869207>"
+        elif place == 3:
+            emoji = "<:Medal_Bronze:1402383923991806063>"
+        elif place == 4:
+            emoji = "4️⃣"
+        else:
+            emoji = "📍"
+
+        place_suffix = "st" if place == 1 else "nd" if place == 2 else "rd" if place == 3 else "th"
+        prize_text += f"{emoji} {place}{place_suffix}: {sp} Seasonal Points\n"
+
+    embed.add_field(name="🏆 Prizes", value=prize_text, inline=False)
 
-    embed.set_footer(text="Use !winner @player to record match results")
+    # Add winner's avatar if it's a real player
+    if not winner_data.is_fake:
+        winner_member = (await member_cache.resolve(guild, [winner_data.id], query=LOW_MEMORY)).get(winner_data.id)
+        if winner_member:
+            embed.set_thumbnail(url=winner_member.display_avatar.url)
 
-    # Create a new view without buttons for active tournament
-    active_tournament_view = discord.ui.View()
-    tournament.message = await ctx.send(embed=embed, view=active_tournament_view)
+    # Add footer with tournament ID and timestamp
+    embed.set_footer(text=f"Tournament completed • {datetime.now().strftime('%d.%m.%Y %H:%M')}")
+
+    # Create a new view without buttons for the completed tournament
+    completed_view = discord.ui.View()
+    await channel.send(embed=embed, view=completed_view)
 
 @bot.command()
 async def winner(ctx, member: discord.Member):
@@ -619,203 +1522,35 @@ async def winner(ctx, member: discord.Member):
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'htr') and not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('htr', 'tlr'), manage_channels=True):
         return await ctx.send("❌ You don't have permission to set winners.", delete_after=5)
 
-    tournament = get_tournament(ctx.guild.id)
-
-    if not tournament.active:
-        return await ctx.send("❌ No active tournament.", delete_after=5)
-
-    current_round = tournament.rounds[-1]
-    winner_name = get_player_display_name(member, ctx.guild.id)
-
-    # Find and update the match
-    match_found = False
-    eliminated_players = []
-    match_index = -1
-
-    for i, match in enumerate(current_round):
-        a, b = match
-        if member == a or member == b:
-            tournament.results.append(member)
-            eliminated_players.extend([a if member == b else b])
-            match_found = True
-            match_index = i
-            break
-
-    if not match_found:
-        return await ctx.send("❌ This player is not in the current round.", delete_after=5)
-
-    # Add eliminated players to elimination list
-    tournament.eliminated.extend(eliminated_players)
-
-    # Update current tournament message to show the winner
-    if tournament.message:
-        try:
-            current_embed = tournament.message.embeds[0]
-
-            # Find and update the specific match field
-            if match_index >= 0 and match_index < len(current_embed.fields):
-                field = current_embed.fields[match_index]
-                if "Match" in field.name:
-                    field_value = field.value
-                    lines = field_value.split('\n')
-                    lines[1] = f"<:Crown:1409926966236283012> Winner: **{get_player_display_name(member, ctx.guild.id)}**"
+    async with locked_tournament(ctx.guild.id, channel_id=ctx.channel.id) as tournament:
+        if tournament is None or not tournament.active:
+            return await ctx.send("❌ No active tournament.", delete_after=5)
 
-                    current_embed.set_field_at(match_index, name=field.name, value='\n'.join(lines), inline=field.inline)
-                    await tournament.message.edit(embed=current_embed)
+        confirmation = await report_results(ctx.guild, ctx.channel, tournament, [member.id])
+    await ctx.send(confirmation, delete_after=5, allowed_mentions=discord.AllowedMentions.none())
 
-        except Exception as e:
-            print(f"Error updating tournament message: {e}")
-
-    # Check if round is complete
-    if len(tournament.results) == len(current_round):
-        if len(tournament.results) == 1:
-            # Tournament finished - determine placements and award SP
-            winner_data = tournament.results[0]
-
-            # Calculate placements based on elimination order
-            all_eliminated = tournament.eliminated
-
-            # Get the final 4 placements
-            placements = [] # List of (place, player, sp_reward)
-
-            # 1st place (winner)
-            placements.append((1, winner_data, 3))
-            if hasattr(winner_data, 'id') and not isinstance(winner_data, FakePlayer):
-                add_sp(ctx.guild.id, winner_data.id, 3)
-
-            # 2nd place (last eliminated)
-            if len(all_eliminated) >= 1:
-                placements.append((2, all_eliminated[-1], 2))
-                player = all_eliminated[-1]
-                if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                    add_sp(ctx.guild.id, player.id, 2)
-
-            # 3rd and 4th place
-            if len(all_eliminated) >= 2:
-                placements.append((3, all_eliminated[-2], 1))
-                player = all_eliminated[-2]
-                if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                    add_sp(ctx.guild.id, player.id, 1)
-            if len(all_eliminated) >= 3:
-                placements.append((4, all_eliminated[-3], 1))
-                player = all_eliminated[-3]
-                if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                    add_sp(ctx.guild.id, player.id, 1)
-
-            # Create styled tournament winners embed
-            winner_display = get_player_display_name(winner_data, ctx.guild.id)
-
-            embed = discord.Embed(
-                title="🏆 Tournament Winners!",
-                description=f"Congratulations to **{winner_display}** for winning the\n**{tournament.title}** tournament! 🎉",
-                color=0xffd700
-            )
-
-            # Add tournament info with custom emojis
-            embed.add_field(name="<:map:1409924163346370560> Map", value=tournament.map, inline=True)
-            embed.add_field(name="<:abilities:1402690411759407185> Abilities", value=tournament.abilities, inline=True)
-            embed.add_field(name="🎮 Mode", value="1v1", inline=True)
-
-            # Create results text
-            results_display = ""
-            for place, player_obj, sp in placements:
-                if place == 1:
-                    emoji = "<:Medal_Gold:1402383868505624576>"
-                elif place == 2:
-                    emoji = "<:Medal_Silver:1402383899597869207>"
-                elif place == 3:
-                    emoji = "<:Medal_Bronze:1402383923991806063>"
-                elif place == 4:
-                    emoji = "4️⃣"
-                else:
-                    emoji = "📍"
-
-                player_str = get_player_display_name(player_obj, ctx.guild.id)
-                results_display += f"{emoji} {player_str}\n"
-
-            embed.add_field(name="🏆 Final Rankings", value=results_display, inline=False)
-
-            # Add prizes section with SP
-            prize_text = ""
-            for place, player_obj, sp in placements:
-                if place == 1:
-                    emoji = "<:Medal_Gold:1402383868505624576>"
-                elif place == 2:
-                    emoji = "<:Medal_Silver:1402383899597869207>"
-                elif place == 3:
-                    emoji = "<:Medal_Bronze:1402383923991806063>"
-                elif place == 4:
-                    emoji = "4️⃣"
-                else:
-                    emoji = "📍"
-
-                place_suffix = "st" if place == 1 else "nd" if place == 2 else "rd" if place == 3 else "th"
-                prize_text += f"{emoji} {place}{place_suffix}: {sp} Seasonal Points\n"
-
-            embed.add_field(name="🏆 Prizes", value=prize_text, inline=False)
-
-            # Add winner's avatar if it's a real player
-            winner_player_obj = winner_data
-            if hasattr(winner_player_obj, 'display_avatar') and not isinstance(winner_player_obj, FakePlayer):
-                embed.set_thumbnail(url=winner_player_obj.display_avatar.url)
-
-            # Add footer with tournament ID and timestamp
-            embed.set_footer(text=f"Tournament completed • {datetime.now().strftime('%d.%m.%Y %H:%M')}")
-
-            # Create a new view without buttons for the completed tournament
-            completed_view = discord.ui.View()
-            await ctx.send(embed=embed, view=completed_view)
-
-            # Reset tournament
-            tournament.__init__()
-        else:
-            # Create next round
-            next_round_pairs = []
-            for i in range(0, len(tournament.results), 2):
-                if i + 1 < len(tournament.results):
-                    next_round_pairs.append((tournament.results[i], tournament.results[i+1]))
-
-            tournament.rounds.append(next_round_pairs)
-            tournament.results = []
-
-            round_num = len(tournament.rounds)
-            embed = discord.Embed(
-                title=f"🏆 {tournament.title} - Round {round_num}",
-                description=f"**Map:** {tournament.map}\n**Abilities:** {tournament.abilities}",
-                color=0x3498db
-            )
-
-            for i, match in enumerate(next_round_pairs, 1):
-                a, b = match
-                player_a = get_player_display_name(a, ctx.guild.id)
-                player_b = get_player_display_name(b, ctx.guild.id)
-                embed.add_field(
-                    name=f"⚔️ Match {i}",
-                    value=f"**{player_a}** <:VS:1402690899485655201> **{player_b}**\n<:Crown:1409926966236283012> Winner: *Waiting...*",
-                    inline=False
-                )
-
-            embed.set_footer(text="Use !winner @player to record match results")
+@bot.command()
+async def winners(ctx, *members: discord.Member):
+    try:
+        await ctx.message.delete()
+    except:
+        pass
 
-            # Create a new view without buttons for active tournament
-            active_tournament_view = discord.ui.View()
-            tournament.message = await ctx.send(embed=embed, view=active_tournament_view)
+    if not can(ctx.author, ctx.guild.id, ('htr', 'tlr'), manage_channels=True):
+        return await ctx.send("❌ You don't have permission to set winners.", delete_after=5)
 
-    await ctx.send(f"✅ {winner_name} wins their match!", delete_after=5)
+    if not members:
+        return await ctx.send("❌ Mention the winners, e.g. `!winners @player1 @player2`.", delete_after=5)
 
-class FakePlayer:
-    def __init__(self, name, user_id):
-        self.display_name = name
-        self.name = name
-        self.nick = name
-        self.id = user_id
-        self.mention = f"<@{user_id}>"
+    async with locked_tournament(ctx.guild.id, channel_id=ctx.channel.id) as tournament:
+        if tournament is None or not tournament.active:
+            return await ctx.send("❌ No active tournament.", delete_after=5)
 
-    def __str__(self):
-        return self.mention
+        confirmation = await report_results(ctx.guild, ctx.channel, tournament, [member.id for member in members])
+    await ctx.send(confirmation, delete_after=10, allowed_mentions=discord.AllowedMentions.none())
 
 @bot.command()
 async def fake(ctx, number: int = 1):
@@ -824,38 +1559,39 @@ async def fake(ctx, number: int = 1):
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('tlr',), manage_channels=True):
         return await ctx.send("❌ You don't have permission to add fake players.", delete_after=5)
 
-    tournament = get_tournament(ctx.guild.id)
-
-    if number < 1 or number > 16:
-        return await ctx.send("❌ Number must be between 1 and 16.", delete_after=5)
+    async with locked_tournament(ctx.guild.id, channel_id=ctx.channel.id) as tournament:
+        if number < 1 or number > 16:
+            return await ctx.send("❌ Number must be between 1 and 16.", delete_after=5)
 
-    if tournament.max_players == 0:
-        return await ctx.send("❌ No tournament created yet.", delete_after=5)
+        if tournament is None:
+            return await ctx.send(NO_TOURNAMENT_HERE, delete_after=5)
 
-    if tournament.active:
-        return await ctx.send("❌ Tournament already started.", delete_after=5)
+        if tournament.active:
+            return await ctx.send("❌ Tournament already started.", delete_after=5)
 
-    available_spots = tournament.max_players - len(tournament.players)
+        available_spots = tournament.max_players - len(tournament.players)
 
-    if number > available_spots:
-        return await ctx.send(f"❌ Only {available_spots} spots available.", delete_after=5)
+        if number > available_spots:
+            return await ctx.send(f"❌ Only {available_spots} spots available.", delete_after=5)
 
-    # Create fake players as proper objects
-    fake_players = []
-    for i in range(number):
-        fake_name = f"FakePlayer{tournament.fake_count}"
-        fake_id = 761557952975420886 + tournament.fake_count
-        fake_player = FakePlayer(fake_name, fake_id)
-        fake_players.append(fake_player)
-        tournament.fake_count += 1
+        fake_players = []
+        for i in range(number):
+            fake_name = f"FakePlayer{tournament.fake_count}"
+            fake_id = 761557952975420886 + tournament.fake_count
+            fake_player = PlayerRef(fake_id, fake_name, is_fake=True)
+            tournament.add_player(fake_player)
+            fake_players.append(fake_player)
+            tournament.fake_count += 1
+            log_tournament('register', ctx.guild.id, tournament, player=[fake_id, fake_name, True],
+                           fake_count=tournament.fake_count)
 
-    tournament.players.extend(fake_players)
+        save_tournament(ctx.guild.id, tournament)
 
-    fake_list = ", ".join([f.display_name for f in fake_players])
-    await ctx.send(f"🤖 Added {number} fake player{'s' if number > 1 else ''}: {fake_list}\nTotal players: {len(tournament.players)}/{tournament.max_players}", delete_after=10)
+        fake_list = ", ".join([f.name for f in fake_players])
+        await ctx.send(f"🤖 Added {number} fake player{'s' if number > 1 else ''}: {fake_list}\nTotal players: {len(tournament.players)}/{tournament.max_players}", delete_after=10)
 
 @bot.command()
 async def code(ctx, code: str, member: discord.Member = None):
@@ -864,50 +1600,46 @@ async def code(ctx, code: str, member: discord.Member = None):
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'htr') and not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('htr', 'tlr'), manage_channels=True):
         return await ctx.send("❌ You don't have permission to send codes.", delete_after=5)
 
-    tournament = get_tournament(ctx.guild.id)
+    tournament = find_tournament(ctx.guild.id, ctx.channel.id)
 
-    if not tournament.active:
+    if tournament is None or not tournament.active:
         return await ctx.send("❌ No active tournament.", delete_after=5)
 
-    # Get all players from current round who still need to play
-    current_round = tournament.rounds[-1]
-    round_players = set()  # Use set to prevent duplicates
+    # Real players of the current round, Members are only looked up now
+    round_refs = {}
+    for pair in tournament.rounds[-1].pairs():
+        for index in pair:
+            player = tournament.players[index]
+            if not player.is_fake:
+                round_refs[player.id] = player
 
-    for match in current_round:
-        a, b = match
-        # Add both real players from this match
-        for player in [a, b]:
-            if hasattr(player, 'id') and not isinstance(player, FakePlayer):
-                round_players.add(player)
-
-    if not round_players:
+    if not round_refs:
         return await ctx.send("❌ No real players found in current round.", delete_after=5)
 
+    members = await member_cache.resolve(ctx.guild, list(round_refs), query=True)
+    round_players = list(members.values())
+    missing = [(round_refs[user_id], "left the server") for user_id in round_refs if user_id not in members]
+
     # Send code to all round players
     host_name = ctx.author.nick if ctx.author.nick else ctx.author.display_name
     code_message = f"🔐 **The room code is:** ```{code}```\n**Hosted by:** {host_name}"
 
-    sent_count = 0
-    failed_players = []
+    report = await send_bulk_dm(round_players, code_message)
+    report.failed.extend(missing)
 
-    for player in round_players:
-        try:
-            await player.send(code_message)
-            sent_count += 1
-        except discord.Forbidden:
-            player_name = player.nick if player.nick else player.display_name
-            failed_players.append(player_name)
-        except Exception:
-            player_name = player.nick if player.nick else player.display_name
-            failed_players.append(player_name)
-
-    if failed_players:
-        await ctx.send(f"✅ Code sent to {sent_count} players via DM!\n❌ Failed to send to: {', '.join(failed_players)}", delete_after=10)
+    print(f"Code DMs: {report.sent_count} sent, {len(report.failed)} failed, {report.retries} retries in {report.elapsed:.2f}s")
+    for player, reason in report.failed:
+        print(f"Code not delivered to {player.id}: {reason}")
+
+    timing = f"⏱️ {report.elapsed:.1f}s total, {report.average_latency * 1000:.0f}ms average per DM"
+    if report.failed:
+        failed_players = [f"{get_player_display_name(player, ctx.guild.id)} ({reason})" for player, reason in report.failed]
+        await ctx.send(f"✅ Code sent to {report.sent_count} players via DM!\n❌ Failed to send to: {', '.join(failed_players)}\n{timing}", delete_after=10)
     else:
-        await ctx.send(f"✅ Code sent to all {sent_count} round players via DM!", delete_after=5)
+        await ctx.send(f"✅ Code sent to all {report.sent_count} round players via DM!\n{timing}", delete_after=5)
 
 @bot.command()
 async def cancel(ctx):
@@ -916,12 +1648,14 @@ async def cancel(ctx):
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('tlr',), manage_channels=True):
         return await ctx.send("❌ You don't have permission to cancel tournaments.", delete_after=5)
 
-    tournament = get_tournament(ctx.guild.id)
-    tournament.__init__()
-    await ctx.send("❌ Tournament cancelled.", delete_after=5)
+    async with locked_tournament(ctx.guild.id, channel_id=ctx.channel.id) as tournament:
+        if tournament is None:
+            return await ctx.send(NO_TOURNAMENT_HERE, delete_after=5)
+        end_tournament(ctx.guild.id, tournament)
+        await ctx.send("❌ Tournament cancelled.", delete_after=5)
 
 @bot.command()
 async def hosterregist(ctx, max_hosters: int):
@@ -930,28 +1664,17 @@ async def hosterregist(ctx, max_hosters: int):
     except:
         pass
 
-    if not has_permission(ctx.author, ctx.guild.id, 'tlr') and not ctx.author.guild_permissions.manage_channels:
+    if not can(ctx.author, ctx.guild.id, ('tlr',), manage_channels=True):
         return await ctx.send("❌ You don't have permission to start hoster registration.", delete_after=5)
 
     if max_hosters < 1 or max_hosters > 20:
         return await ctx.send("❌ Maximum hosters must be between 1 and 20.", delete_after=5)
 
-    host_registrations['active'] = True
-    host_registrations['max_hosters'] = max_hosters
-    host_registrations['hosters'] = []
-    host_registrations['channel'] = ctx.channel
-
-    embed = discord.Embed(
-        title="🎯 Hoster Registration",
-        description="Here the hosters will register to host tournaments!",
-        color=0x00ff00
-    )
-
-    embed.add_field(name="Hosters registered:", value="None yet", inline=False)
-    embed.add_field(name="Slots:", value=f"0/{max_hosters}", inline=True)
-
+    # Each registration message has its own roster, several can run side by side
+    roster = HosterRoster(max_hosters, ctx.channel.id)
     view = HosterRegistrationView()
-    host_registrations['message'] = await ctx.send(embed=embed, view=view)
+    message = await ctx.send(embed=hoster_embed(roster), view=view)
+    save_roster(ctx.guild.id, message.id, roster)
 
 @bot.command()
 @commands.has_permissions(manage_roles=True)
@@ -976,12 +1699,10 @@ async def bracketrole(ctx, member: discord.Member, emoji1: str, emoji2: str = ""
         bracket_roles[guild_str] = {}
 
     bracket_roles[guild_str][str(member.id)] = emojis
-    save_data()
+    save_data('bracket_roles', guild_str, str(member.id))
+    display_names.forget(ctx.guild.id, member.id)
 
-    emoji_display = ''.join(emojis)
-    player_name = member.nick if member.nick else member.display_name
-
-    await ctx.send(f"✅ Bracket role set for {member.mention}! Their bracket name: {player_name} {emoji_display}", delete_after=10)
+    await ctx.send(f"✅ Bracket role set for {member.mention}! Their bracket name: {get_player_display_name(member, ctx.guild.id)}", delete_after=10)
 
 @bot.command()
 async def bracketname(ctx):
@@ -990,14 +1711,7 @@ async def bracketname(ctx):
     except:
         pass
 
-    guild_str = str(ctx.guild.id)
-    if guild_str in bracket_roles and str(ctx.author.id) in bracket_roles[guild_str]:
-        emojis = ''.join(bracket_roles[guild_str][str(ctx.author.id)])
-        player_name = ctx.author.nick if ctx.author.nick else ctx.author.display_name
-        bracket_name = f"{player_name} {emojis}"
-    else:
-        player_name = ctx.author.nick if ctx.author.nick else ctx.author.display_name
-        bracket_name = player_name
+    bracket_name = get_player_display_name(ctx.author, ctx.guild.id)
 
     embed = discord.Embed(
         title="🏷️ Your Bracket Name",
@@ -1028,7 +1742,8 @@ async def bracketrolereset(ctx, member: discord.Member = None):
         # Clean up guild entry if it becomes empty
         if not bracket_roles[guild_str]:
             del bracket_roles[guild_str]
-        save_data()
+        save_data('bracket_roles', guild_str, str(member.id))
+        display_names.forget(ctx.guild.id, member.id)
 
         if member == ctx.author:
             await ctx.send("✅ Your bracket role reset! Your emojis have been removed.", delete_after=5)
@@ -1067,51 +1782,269 @@ async def sp(ctx, member: discord.Member = None):
         await ctx.send(embed=embed, delete_after=10)
 
 @bot.command()
-async def sp_lb(ctx):
+async def sp_lb(ctx, page: int = 1):
     try:
         await ctx.message.delete()
     except:
         pass
 
-    guild_str = str(ctx.guild.id)
-    guild_sp_data = sp_data.get(guild_str, {})
-
-    # Sort players by SP
-    sorted_players = sorted(guild_sp_data.items(), key=lambda x: x[1], reverse=True)[:10]
+    if page < 1:
+        return await ctx.send("❌ Page must be 1 or higher.", delete_after=5)
+
+    leaderboard = get_leaderboard(ctx.guild.id)
+
+    # Players who left the server are skipped without shortening the page.
+    # Members are looked up in batches, widening the window until the page is full.
+    members = {}
+    checked = set()
+    window = page * 10 + 10
+    while True:
+        user_ids = [user_id for user_id in leaderboard.user_ids(0, window) if user_id not in checked]
+        checked.update(user_ids)
+        members.update(await member_cache.resolve(ctx.guild, user_ids, query=LOW_MEMORY))
+        entries = leaderboard.page(page, 10, is_present=lambda user_id: user_id in members)
+        if len(entries) == 10 or window >= len(leaderboard):
+            break
+        window *= 2
 
     embed = discord.Embed(
         title="🏆 Seasonal Points Leaderboard",
         color=0xf1c40f
     )
 
-    if not sorted_players:
-        embed.description = "No players have SP yet!"
+    if not entries:
+        embed.description = "No players have SP yet!" if page == 1 else "No players on this page."
     else:
         leaderboard_text = ""
-        for i, (user_id, sp) in enumerate(sorted_players, 1):
-            user = ctx.guild.get_member(int(user_id))
-            if user:
-                leaderboard_text += f"**{i}.** {user.display_name} - {sp} SP\n"
+        for rank, user_id, sp in entries:
+            user = members[user_id]
+            leaderboard_text += f"**{rank}.** {user.display_name} - {sp} SP\n"
 
         embed.description = leaderboard_text
 
+    author_rank = leaderboard.rank(ctx.author.id)
+    if author_rank:
+        embed.set_footer(text=f"Page {page} • Your rank: #{author_rank} of {len(leaderboard)}")
+    else:
+        embed.set_footer(text=f"Page {page} • You have no SP yet")
+
     await ctx.send(embed=embed, delete_after=30)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
-async def sp_rst(ctx):
+async def sp_rst(ctx, *, name: str = ""):
     try:
         await ctx.message.delete()
     except:
         pass
 
     guild_str = str(ctx.guild.id)
-    if guild_str in sp_data:
-        sp_data[guild_str] = {}
-        save_data()
-        await ctx.send("✅ All Seasonal Points have been reset for this server!", delete_after=5)
-    else:
-        await ctx.send("✅ No Seasonal Points to reset in this server!", delete_after=5)
+    if not sp_data.get(guild_str):
+        return await ctx.send("✅ No Seasonal Points to reset in this server!", delete_after=5)
+
+    # Reset before awaiting anything, SP awarded while the archive is written count for the new season
+    standings = [(user_id, -neg_sp) for neg_sp, user_id in get_leaderboard(ctx.guild.id).ranking]
+    detached = sp_data[guild_str]
+    sp_data[guild_str] = {}
+    save_data('sp_data', guild_str)
+    leaderboards.pop(guild_str, None)
+    event_log.append('sp_reset', guild_str, by=ctx.author.id)
+    try:
+        season = await asyncio.to_thread(season_archive.append, ctx.guild.id, standings, name)
+    except (OSError, struct.error) as e:
+        print(f"Error archiving season: {e}")
+        # Put the season back, players changed in the meantime keep their new SP
+        restored = {**detached, **sp_data.get(guild_str, {})}
+        apply_sp_changes(ctx.guild.id, restored, reason="sp_reset_failed", by=ctx.author.id)
+        return await ctx.send("❌ Could not archive this season, SP were not reset.", delete_after=10)
+
+    await ctx.send(f"✅ Season {season.number} archived with {season.players} players, all Seasonal Points have been reset! "
+                   f"See it with `!season_top {season.number}`.", delete_after=10)
+
+def season_title(season, label):
+    ended = datetime.fromtimestamp(season.ended_at).strftime('%Y-%m-%d')
+    return f"Season {season.number}" + (f" - {label}" if label else "") + f" (ended {ended})"
+
+@bot.command()
+async def seasons(ctx):
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    archived = await asyncio.to_thread(season_archive.seasons, ctx.guild.id)
+    if not archived:
+        return await ctx.send("❌ No seasons have been archived in this server yet.", delete_after=5)
+
+    lines = [f"**{season.number}.** ended {datetime.fromtimestamp(season.ended_at).strftime('%Y-%m-%d')}, "
+             f"{season.players} players" for season in archived[-20:]]
+    embed = discord.Embed(title="📚 Past Seasons", description="\n".join(lines), color=0xf1c40f)
+    embed.set_footer(text="!season_top <season> for the standings, !sp_history for a player's seasons")
+    await ctx.send(embed=embed, delete_after=30)
+
+@bot.command()
+async def season_top(ctx, season_number: int = None, count: int = 10):
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    if not 1 <= count <= 25:
+        return await ctx.send("❌ Count must be between 1 and 25.", delete_after=5)
+
+    if season_number is None:
+        archived = await asyncio.to_thread(season_archive.seasons, ctx.guild.id)
+        season_number = archived[-1].number if archived else 0
+
+    try:
+        result = await asyncio.to_thread(season_archive.top, ctx.guild.id, season_number, count)
+    except (OSError, ValueError) as e:
+        print(f"Error reading season {season_number}: {e}")
+        return await ctx.send("❌ Could not read that season.", delete_after=5)
+    if result is None:
+        return await ctx.send("❌ No such season, `!seasons` lists them.", delete_after=5)
+
+    season, label, entries = result
+    members = await member_cache.resolve(ctx.guild, [user_id for _, user_id, _ in entries], query=False)
+    lines = [f"**{rank}.** {base_name(members[user_id]) if user_id in members else f'<@{user_id}>'} - {sp} SP"
+             for rank, user_id, sp in entries]
+    embed = discord.Embed(title=f"🏆 {season_title(season, label)}", description="\n".join(lines) or "No players.",
+                          color=0xf1c40f)
+    embed.set_footer(text=f"Top {len(entries)} of {season.players} players")
+    await ctx.send(embed=embed, delete_after=30)
+
+@bot.command()
+async def sp_history(ctx, member: discord.Member = None):
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    if member is None:
+        member = ctx.author
+
+    try:
+        history = await asyncio.to_thread(season_archive.history, ctx.guild.id, member.id)
+    except (OSError, ValueError) as e:
+        print(f"Error reading season history: {e}")
+        return await ctx.send("❌ Could not read the season archive.", delete_after=5)
+
+    current = sp_data.get(str(ctx.guild.id), {}).get(str(member.id))
+    lines = [f"**{season_title(season, label)}:** #{rank} of {season.players}, {sp} SP"
+             for season, label, rank, sp in history[-15:]]
+    if current is not None:
+        lines.append(f"**Current season:** #{get_leaderboard(ctx.guild.id).rank(member.id)}, {current} SP")
+    embed = discord.Embed(title=f"📜 Season History of {base_name(member)}",
+                          description="\n".join(lines) or "No seasons played yet.", color=0x3498db)
+    await ctx.send(embed=embed, delete_after=30)
+
+SP_IMPORT_MAX_BYTES = 5 * 1024 * 1024
+
+async def change_sp(ctx, mode, amount, members):
+    """Shared body of !sp_add and !sp_set"""
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    if not can_manage_sp(ctx.author, ctx.guild.id):
+        return await ctx.send("❌ You don't have permission to change SP.", delete_after=5)
+    if not members:
+        return await ctx.send(f"❌ Mention the players, e.g. `!sp_{mode} 3 @player1 @player2`.", delete_after=5)
+
+    new_values, errors = plan_sp_changes(ctx.guild.id, [(str(member.id), amount) for member in members], mode)
+    if errors:
+        return await ctx.send(f"❌ Nothing was changed, SP must stay between 0 and {SP_MAX}: {', '.join(errors[:10])}", delete_after=10,
+                              allowed_mentions=discord.AllowedMentions.none())
+
+    apply_sp_changes(ctx.guild.id, new_values, reason=f"sp_{mode}", by=ctx.author.id)
+    done = f"Added {amount} SP to" if mode == 'add' else f"Set SP to {amount} for"
+    await ctx.send(f"✅ {done} {len(new_values)} player{'s' if len(new_values) != 1 else ''}.", delete_after=10)
+
+@bot.command()
+async def sp_add(ctx, amount: int, *members: discord.Member):
+    await change_sp(ctx, 'add', amount, members)
+
+@bot.command()
+async def sp_set(ctx, amount: int, *members: discord.Member):
+    await change_sp(ctx, 'set', amount, members)
+
+@bot.command()
+async def sp_import(ctx, mode: str = "set"):
+    """Import SP from an attached CSV of user_id,sp rows, all or nothing"""
+    allowed = can_manage_sp(ctx.author, ctx.guild.id)
+    attachment = next((a for a in ctx.message.attachments if a.filename.lower().endswith('.csv')), None)
+
+    # The attachment is read before the command message is deleted
+    text = read_error = None
+    if allowed and mode in ('set', 'add') and attachment and attachment.size <= SP_IMPORT_MAX_BYTES:
+        try:
+            text = (await attachment.read()).decode('utf-8-sig')
+        except (discord.HTTPException, UnicodeDecodeError) as e:
+            read_error = e
+
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    if not allowed:
+        return await ctx.send("❌ You don't have permission to change SP.", delete_after=5)
+    if mode not in ('set', 'add'):
+        return await ctx.send("❌ Mode must be `set` (replace each player's SP) or `add`.", delete_after=5)
+    if attachment is None:
+        return await ctx.send("❌ Attach a CSV file with `user_id,sp` rows.", delete_after=5)
+    if attachment.size > SP_IMPORT_MAX_BYTES:
+        return await ctx.send(f"❌ The file is too big, the limit is {SP_IMPORT_MAX_BYTES // (1024 * 1024)} MB.", delete_after=5)
+    if text is None:
+        return await ctx.send(f"❌ Could not read the file: {read_error}", delete_after=10)
+
+    rows, errors = parse_sp_csv(text)
+    new_values, negative = plan_sp_changes(ctx.guild.id, rows, mode)
+    errors += negative
+    if errors:
+        listed = "\n".join(errors[:10]) + (f"\n...and {len(errors) - 10} more" if len(errors) > 10 else "")
+        return await ctx.send(f"❌ Nothing was imported, fix these first:\n{listed}", delete_after=30,
+                              allowed_mentions=discord.AllowedMentions.none())
+    if not new_values:
+        return await ctx.send("❌ The file has no rows.", delete_after=5)
+
+    apply_sp_changes(ctx.guild.id, new_values, reason=f"sp_import_{mode}", by=ctx.author.id)
+    # Written right away, in one flush, so a restart can't lose part of the import
+    try:
+        await store.flush()
+    except Exception as e:
+        print(f"Error flushing SP import: {e}")
+
+    verb = "Set" if mode == 'set' else "Updated"
+    await ctx.send(f"✅ {verb} SP for {len(new_values)} players from {len(rows)} rows.", delete_after=10)
+
+@bot.command()
+async def sp_export(ctx):
+    """Send the guild's SP standings as a CSV file"""
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    if not can_manage_sp(ctx.author, ctx.guild.id):
+        return await ctx.send("❌ You don't have permission to export SP.", delete_after=5)
+
+    leaderboard = get_leaderboard(ctx.guild.id)
+    if not len(leaderboard):
+        return await ctx.send("❌ No players have SP yet!", delete_after=5)
+
+    def entries():
+        for rank, (neg_sp, user_id) in enumerate(leaderboard.ranking, 1):
+            member = ctx.guild.get_member(user_id)
+            yield rank, user_id, base_name(member) if member else "", -neg_sp
+
+    # Rows go straight to a temporary file that is uploaded from disk
+    with tempfile.TemporaryFile() as file:
+        count = write_sp_csv(file, entries())
+        file.seek(0)
+        await ctx.send(f"📊 SP standings, {count} players:",
+                       file=discord.File(file, filename=f"sp_{ctx.guild.id}.csv"))
 
 # Role permission commands
 @bot.command()
@@ -1130,7 +2063,8 @@ async def htr(ctx, *roles: discord.Role):
         role_permissions[guild_str] = {}
 
     role_permissions[guild_str]['htr'] = [role.id for role in roles]
-    save_data()
+    save_data('role_permissions', guild_str, 'htr')
+    compile_permissions(guild_str)
 
     role_mentions = [role.mention for role in roles]
     await ctx.send(f"✅ HTR permissions granted to: {', '.join(role_mentions)}", delete_after=10)
@@ -1148,7 +2082,8 @@ async def adr(ctx, role: discord.Role):
         role_permissions[guild_str] = {}
 
     role_permissions[guild_str]['adr'] = [role.id]
-    save_data()
+    save_data('role_permissions', guild_str, 'adr')
+    compile_permissions(guild_str)
 
     await ctx.send(f"✅ ADR permissions granted to: {role.mention}", delete_after=10)
 
@@ -1168,11 +2103,39 @@ async def tlr(ctx, *roles: discord.Role):
         role_permissions[guild_str] = {}
 
     role_permissions[guild_str]['tlr'] = [role.id for role in roles]
-    save_data()
+    save_data('role_permissions', guild_str, 'tlr')
+    compile_permissions(guild_str)
 
     role_mentions = [role.mention for role in roles]
     await ctx.send(f"✅ TLR permissions granted to: {', '.join(role_mentions)}", delete_after=10)
 
+@bot.command()
+@commands.is_owner()
+async def profile(ctx, action: str = "status", mode: str = "cprofile"):
+    """Capture a profile of the whole bot: !profile start [cprofile|pyinstrument], !profile stop"""
+    try:
+        await ctx.message.delete()
+    except:
+        pass
+
+    if action == "start":
+        if profile_capture.active:
+            return await ctx.send(f"❌ A {profile_capture.mode} capture is already running.", delete_after=5)
+        try:
+            profile_capture.start(mode)
+        except ValueError as e:
+            return await ctx.send(f"❌ {e}", delete_after=10)
+        await ctx.send(f"✅ {mode} capture started, use `!profile stop` to get the report.", delete_after=10)
+    elif action == "stop":
+        if not profile_capture.active:
+            return await ctx.send("❌ No capture is running.", delete_after=5)
+        report = profile_capture.stop()
+        await ctx.send("📊 Profile report:", file=discord.File(io.BytesIO(report.encode()), filename="profile.txt"))
+    else:
+        state = f"a {profile_capture.mode} capture is running" if profile_capture.active else "no capture is running"
+        await ctx.send(f"📊 {state.capitalize()}. Slow handlers: {tracer.slow_count}, loop stalls: {watchdog.stalls}.",
+                       delete_after=10)
+
 # Run the bot
 if __name__ == "__main__":
     if not TOKEN:
@@ -1182,7 +2145,6 @@ if __name__ == "__main__":
         print("Value: Your Discord bot token")
     else:
         try:
-            keep_alive()
             bot.run(TOKEN)
         except Exception as e:
             print(f"❌ Error starting bot: {e}")
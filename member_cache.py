@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+# Discord accepts up to 100 user IDs per member chunk request
+CHUNK_SIZE = 100
+
+
+class MemberCache:
+    """LRU cache of the members the bot actually dealt with, across all guilds"""
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self.members = OrderedDict()  # {(guild_id, user_id): Member}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.members)
+
+    def remember(self, member):
+        guild = getattr(member, 'guild', None)
+        if guild is None:
+            return
+        key = (guild.id, member.id)
+        self.members[key] = member
+        self.members.move_to_end(key)
+        if len(self.members) > self.capacity:
+            self.members.popitem(last=False)
+
+    def get(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        member = self.members.get(key)
+        if member is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.members.move_to_end(key)
+        return member
+
+    def forget(self, guild_id, user_id):
+        self.members.pop((guild_id, user_id), None)
+
+    async def resolve(self, guild, user_ids, query=True):
+        """Return {user_id: Member} for the IDs still in the guild
+
+        Cached members are returned directly. With `query`, the rest are requested
+        over the gateway in chunks of up to 100 IDs instead of one fetch_member
+        per ID.
+        """
+        found = {}
+        missing = []
+        for user_id in user_ids:
+            member = self.get(guild.id, user_id) or guild.get_member(user_id)
+            if member is not None:
+                found[user_id] = member
+            else:
+                missing.append(user_id)
+
+        if not query:
+            return found
+
+        for i in range(0, len(missing), CHUNK_SIZE):
+            chunk = missing[i:i + CHUNK_SIZE]
+            try:
+                members = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=False)
+            except Exception as e:
+                print(f"Error querying members: {e}")
+                continue
+            for member in members:
+                self.remember(member)
+                found[member.id] = member
+
+        return found
+
+
+def base_name(user):
+    """Name a member goes by: server nick, then display name, then username"""
+    return getattr(user, 'nick', None) or user.display_name or user.name
+
+
+class DisplayNames:
+    """LRU cache of bracket names, resolved once per player until something about them changes"""
+
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self.names = OrderedDict()  # {(guild_id, user_id): bracket name}
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        name = self.names.get(key)
+        if name is not None:
+            self.names.move_to_end(key)
+        return name
+
+    def set(self, guild_id, user_id, name):
+        key = (guild_id, user_id)
+        self.names[key] = name
+        self.names.move_to_end(key)
+        if len(self.names) > self.capacity:
+            self.names.popitem(last=False)
+
+    def forget(self, guild_id, user_id=None):
+        if user_id is not None:
+            self.names.pop((guild_id, user_id), None)
+            return
+        for key in [key for key in self.names if key[0] == guild_id]:
+            del self.names[key]
+
+    def forget_user(self, user_id):
+        """Drop a user everywhere, for changes that are not tied to one guild"""
+        for key in [key for key in self.names if key[1] == user_id]:
+            del self.names[key]
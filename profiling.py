@@ -0,0 +1,210 @@
+import asyncio
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+STACK_DEPTH = 12  # frames printed for a stalled loop
+
+
+def _suspended_at(coro):
+    """Where a suspended coroutine is waiting, outermost frame first"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            break
+        frames.append(f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return frames
+
+
+class HandlerTrace:
+    """Timings of one handler run. Blocking time is spent on the loop between awaits."""
+
+    __slots__ = ('name', 'wall', 'blocking', 'awaits', 'longest', 'stack')
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.blocking = 0.0
+        self.awaits = 0
+        self.longest = 0.0  # longest stretch without yielding to the loop
+        self.stack = None  # where the handler was suspended right after that stretch
+
+    def describe(self):
+        text = (f"{self.name}: {self.wall * 1000:.0f} ms, {self.blocking * 1000:.0f} ms blocking "
+                f"over {self.awaits} awaits, longest step {self.longest * 1000:.0f} ms")
+        if self.stack:
+            text += "".join(f"\n    at {frame}" for frame in self.stack)
+        elif self.stack is not None:
+            text += "\n    (longest step ran until the handler returned)"
+        return text
+
+
+class _Stepper:
+    """Await a coroutine one step at a time, timing each step it runs on the loop"""
+
+    def __init__(self, coro, trace):
+        self.coro = coro
+        self.trace = trace
+
+    def __await__(self):
+        coro, trace = self.coro, self.trace
+        value, error = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                yielded = coro.throw(error) if error is not None else coro.send(value)
+            except StopIteration as stop:
+                self._step(time.perf_counter() - start, done=True)
+                return stop.value
+            except BaseException:
+                self._step(time.perf_counter() - start, done=True)
+                raise
+            self._step(time.perf_counter() - start)
+            trace.awaits += 1
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+    def _step(self, elapsed, done=False):
+        trace = self.trace
+        trace.blocking += elapsed
+        if elapsed > trace.longest:
+            trace.longest = elapsed
+            trace.stack = [] if done else _suspended_at(self.coro)
+
+
+class HandlerTracer:
+    """Time handlers step by step and report the ones slower than `slow_ms`"""
+
+    def __init__(self, slow_ms=250.0, on_trace=None):
+        self.slow = slow_ms / 1000
+        self.on_trace = on_trace  # called with every HandlerTrace
+        self.slow_count = 0
+
+    async def trace(self, name, coro):
+        trace = HandlerTrace(name)
+        start = time.perf_counter()
+        try:
+            return await _Stepper(coro, trace)
+        finally:
+            trace.wall = time.perf_counter() - start
+            if self.on_trace is not None:
+                self.on_trace(trace)
+            if trace.wall >= self.slow:
+                self.slow_count += 1
+                print(f"🐢 Slow handler {trace.describe()}")
+
+    def traced(self, func):
+        """Decorator for component callbacks and other coroutine handlers"""
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.trace(name, func(*args, **kwargs))
+
+        return wrapper
+
+
+class LoopWatchdog:
+    """Watch the event loop from a thread and print the loop's stack while it is blocked
+
+    A task on the loop stamps a heartbeat, the thread checks it. Stalls are seen
+    as they happen, so the stack shows the blocking code itself.
+    """
+
+    def __init__(self, stall_ms=500.0):
+        self.stall = stall_ms / 1000
+        self.interval = self.stall / 5
+        self.stalls = 0
+        self.beat = time.monotonic()
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start watching the running loop"""
+        self._loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            self.beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.interval):
+            beat = self.beat
+            stalled = time.monotonic() - beat
+            if stalled < self.stall or beat == reported:
+                continue
+            reported = beat  # once per stall
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)[-STACK_DEPTH:]) if frame else ""
+            print(f"⚠️ Event loop blocked for {stalled * 1000:.0f} ms, it is running:\n{stack}")
+
+
+class ProfileCapture:
+    """Profile everything the loop thread runs between start() and stop()"""
+
+    MODES = ('cprofile', 'pyinstrument') if pyinstrument else ('cprofile',)
+
+    def __init__(self):
+        self.mode = None
+        self.started = None
+        self._profiler = None
+
+    @property
+    def active(self):
+        return self._profiler is not None
+
+    def start(self, mode='cprofile'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler {mode}, available: {', '.join(self.MODES)}")
+        if mode == 'pyinstrument':
+            # Sample the whole thread, not only the task that started it
+            self._profiler = pyinstrument.Profiler(async_mode='disabled')
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.mode = mode
+        self.started = time.monotonic()
+
+    def stop(self, limit=40):
+        """Stop profiling and return the report as text"""
+        profiler, self._profiler = self._profiler, None
+        duration = time.monotonic() - self.started
+        header = f"{self.mode} capture, {duration:.1f} s\n\n"
+        if self.mode == 'pyinstrument':
+            profiler.stop()
+            return header + profiler.output_text()
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return header + out.getvalue()
@@ -0,0 +1,150 @@
+import os
+import struct
+import time
+import zlib
+
+# Index entry per season: number, offset and length of its block, players, crc32 of the block, end time
+INDEX_ENTRY = struct.Struct('<IQIIIq')
+ROW = struct.Struct('<Qq')  # user_id, sp
+LABEL = struct.Struct('<H')  # length of the UTF-8 season label
+
+
+class Season:
+    __slots__ = ('number', 'offset', 'length', 'players', 'crc', 'ended_at')
+
+    def __init__(self, number, offset, length, players, crc, ended_at):
+        self.number = number
+        self.offset = offset
+        self.length = length
+        self.players = players
+        self.crc = crc
+        self.ended_at = ended_at
+
+
+def ranked(rows):
+    """(rank, user_id, sp) from (user_id, sp) rows sorted best first, tied players share a rank"""
+    rank = 0
+    previous = None
+    for position, (user_id, sp) in enumerate(rows, 1):
+        if sp != previous:
+            rank, previous = position, sp
+        yield rank, user_id, sp
+
+
+class SeasonArchive:
+    """Past SP seasons, one append-only file of compressed blocks per guild plus a fixed-size index
+
+    A block holds the season label and its standings, best first, so the top
+    of a season only needs the start of its block decompressed. Seasons are
+    found by seeking in the index, nothing is kept in memory. Every method does
+    blocking file I/O, call them from an executor.
+    """
+
+    def __init__(self, directory='seasons'):
+        self.directory = directory
+
+    def _paths(self, guild_id):
+        base = os.path.join(self.directory, str(guild_id))
+        return base + '.seasons', base + '.idx'
+
+    def seasons(self, guild_id):
+        """Every archived season of a guild, oldest first"""
+        _, index_path = self._paths(guild_id)
+        try:
+            with open(index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        usable = len(data) - len(data) % INDEX_ENTRY.size  # ignore a torn last entry
+        return [Season(*entry) for entry in INDEX_ENTRY.iter_unpack(data[:usable])]
+
+    def season(self, guild_id, number):
+        """One season by number, None if there is no such season"""
+        if number < 1:
+            return None
+        _, index_path = self._paths(guild_id)
+        try:
+            with open(index_path, 'rb') as f:
+                f.seek((number - 1) * INDEX_ENTRY.size)
+                data = f.read(INDEX_ENTRY.size)
+        except FileNotFoundError:
+            return None
+        if len(data) < INDEX_ENTRY.size:
+            return None
+        return Season(*INDEX_ENTRY.unpack(data))
+
+    def append(self, guild_id, standings, label=""):
+        """Archive [(user_id, sp)] standings, best first, as the guild's next season"""
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, index_path = self._paths(guild_id)
+
+        encoded_label = label.encode('utf-8')[:1000]
+        compressor = zlib.compressobj(6)
+        parts = [compressor.compress(LABEL.pack(len(encoded_label)) + encoded_label)]
+        players = 0
+        for user_id, sp in standings:
+            parts.append(compressor.compress(ROW.pack(int(user_id), sp)))
+            players += 1
+        parts.append(compressor.flush())
+        block = b"".join(parts)
+
+        with open(index_path, 'ab+') as index:
+            size = index.seek(0, os.SEEK_END)
+            if size % INDEX_ENTRY.size:
+                # A crash tore the last entry, its block is simply never referenced
+                size -= size % INDEX_ENTRY.size
+                index.truncate(size)
+            number = size // INDEX_ENTRY.size + 1
+
+            # The block is durable before the index points at it
+            with open(data_path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+
+            season = Season(number, offset, len(block), players, zlib.crc32(block), int(time.time()))
+            index.write(INDEX_ENTRY.pack(season.number, season.offset, season.length, season.players,
+                                         season.crc, season.ended_at))
+            index.flush()
+            os.fsync(index.fileno())
+        return season
+
+    def read(self, guild_id, season, limit=None):
+        """Return (label, [(user_id, sp)]) of a season, only the first `limit` rows are decompressed"""
+        data_path, _ = self._paths(guild_id)
+        with open(data_path, 'rb') as f:
+            f.seek(season.offset)
+            block = f.read(season.length)
+        if zlib.crc32(block) != season.crc:
+            raise ValueError(f"Season {season.number} of guild {guild_id} is damaged")
+
+        decompressor = zlib.decompressobj()
+        (label_length,) = LABEL.unpack(decompressor.decompress(block, LABEL.size))
+        label = b""
+        if label_length:
+            label = decompressor.decompress(decompressor.unconsumed_tail, label_length)
+        if limit is None:
+            rows = decompressor.decompress(decompressor.unconsumed_tail) + decompressor.flush()
+        else:
+            rows = decompressor.decompress(decompressor.unconsumed_tail, limit * ROW.size) if limit > 0 else b""
+        return label.decode('utf-8'), list(ROW.iter_unpack(rows))
+
+    def top(self, guild_id, number, count=10):
+        """(season, label, [(rank, user_id, sp)]) for the best `count` players, None if there is no such season"""
+        season = self.season(guild_id, number)
+        if season is None:
+            return None
+        label, rows = self.read(guild_id, season, count)
+        return season, label, list(ranked(rows))
+
+    def history(self, guild_id, user_id):
+        """[(season, label, rank, sp)] for every season the player finished with SP, one season read at a time"""
+        found = []
+        for season in self.seasons(guild_id):
+            label, rows = self.read(guild_id, season)
+            for rank, row_user, sp in ranked(rows):
+                if row_user == user_id:
+                    found.append((season, label, rank, sp))
+                    break
+        return found
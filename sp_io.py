@@ -0,0 +1,54 @@
+import csv
+import io
+
+EXPORT_HEADER = ('rank', 'user_id', 'name', 'sp')
+MAX_USER_ID = 2 ** 63 - 1  # stored as a signed 64-bit integer
+
+
+def parse_sp_csv(text):
+    """Read (user_id, amount) rows from CSV text and return (rows, errors)
+
+    Columns are found by a `user_id` and an `sp` header, so an !sp_export file
+    can be imported as is. Without a header the first two columns are used.
+    Errors carry the line number, any error blocks the whole import.
+    """
+    rows = []
+    errors = []
+    reader = csv.reader(io.StringIO(text))
+    user_col, sp_col = 0, 1
+    for line, record in enumerate(reader, 1):
+        if not record or not any(cell.strip() for cell in record):
+            continue
+        cells = [cell.strip() for cell in record]
+        if line == 1 and not cells[0].isdigit():
+            header = [cell.lower() for cell in cells]
+            if 'user_id' in header and 'sp' in header:
+                user_col, sp_col = header.index('user_id'), header.index('sp')
+            continue
+        if len(cells) <= max(user_col, sp_col):
+            errors.append(f"line {line}: expected a user ID and an SP amount")
+            continue
+        user_id, amount = cells[user_col], cells[sp_col]
+        if not (user_id.isascii() and user_id.isdigit() and 0 < int(user_id) <= MAX_USER_ID):
+            errors.append(f"line {line}: {user_id!r} is not a user ID")
+            continue
+        try:
+            # "0012" and "12" are the same player
+            rows.append((str(int(user_id)), int(amount)))
+        except ValueError:
+            errors.append(f"line {line}: {amount!r} is not a whole number")
+    return rows, errors
+
+
+def write_sp_csv(file, entries):
+    """Write (rank, user_id, name, sp) entries to a binary file one row at a time"""
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    for entry in entries:
+        writer.writerow(entry)
+        count += 1
+    text.flush()
+    text.detach()  # leave the file open for the caller
+    return count
@@ -0,0 +1,385 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_MISSING = object()
+
+
+def _sqlite_int(value):
+    if not isinstance(value, int) or not -2 ** 63 <= value < 2 ** 63:
+        raise ValueError(f"{value!r} is not a 64-bit integer")
+    return value
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, (list, set, tuple)):
+        return [_copy(v) for v in value]
+    return value
+
+
+class Storage:
+    """Base class for storage backends.
+
+    The bot keeps its data in plain {guild_id: {key: value}} dicts. Changes are
+    marked dirty and coalesced, then written by the backend from a background
+    task every `interval` seconds.
+    """
+
+    # Row level backends get only the changed keys, the others get whole guilds
+    row_level = False
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.sections = {}  # {section_name: {guild_id: data}}
+        self.dirty = {}  # {(section_name, guild_id): set of keys, or None for the whole guild}
+        self._task = None
+        self._flush_lock = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        # Counters
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.bytes_written = 0
+        self.rows_written = 0
+        self.rows_dropped = 0  # entries that can't be encoded, skipped so they don't block every flush
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.on_flush = None  # optional callback, given each successful flush time in ms
+        self.before_flush = None  # optional coroutine function, awaited after the changes are copied, before they are written
+
+    def attach(self, name, mapping):
+        """Register a {guild_id: data} dict to be persisted under `name`"""
+        self.sections[name] = mapping
+
+    def load(self, keep=None):
+        """Return {section_name: {guild_id: data}} as stored, only guilds `keep(guild_id)` accepts if given"""
+        raise NotImplementedError
+
+    def _write(self, changes):
+        """Persist a list of (section, guild_id, keys, data) changes (runs in executor)
+
+        Entries that can't be encoded are logged, counted in rows_dropped and
+        skipped, a failed flush is retried so it must only fail for I/O.
+        """
+        raise NotImplementedError
+
+    def _drop(self, section, guild, key, error):
+        self.rows_dropped += 1
+        print(f"❌ Not saving {section} of guild {guild}" + (f", {key}" if key is not None else "") + f": {error}")
+
+    def mark_dirty(self, section, guild_id, key=None):
+        """Mark a guild's section as changed. Pass `key` if only one entry changed."""
+        entry = (section, str(guild_id))
+        if key is None or not self.row_level:
+            self.dirty[entry] = None
+            return
+        if entry in self.dirty and self.dirty[entry] is None:
+            return
+        self.dirty.setdefault(entry, set()).add(str(key))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing data: {e}")
+
+    def _snapshot(self, dirty):
+        """Copy the dirty data so the executor never sees the live dicts"""
+        changes = []
+        for (section, guild), keys in dirty.items():
+            guild_data = self.sections[section].get(guild, _MISSING)
+            if keys is None:
+                data = _MISSING if guild_data is _MISSING else _copy(guild_data)
+            elif guild_data is _MISSING:
+                data = {key: _MISSING for key in keys}
+            else:
+                data = {key: _copy(guild_data[key]) if key in guild_data else _MISSING for key in keys}
+            changes.append((section, guild, keys, data))
+        return changes
+
+    async def flush(self):
+        """Write all pending changes now"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self.dirty:
+                return
+            dirty = self.dirty
+            self.dirty = {}
+            changes = self._snapshot(dirty)
+
+            start = time.perf_counter()
+            try:
+                # Copied first: anything changed while this awaits waits for the next flush
+                if self.before_flush is not None:
+                    await self.before_flush()
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor, self._write, changes)
+            except Exception:
+                self.flush_errors += 1
+                # Put the changes back, anything marked since takes precedence
+                for entry, keys in dirty.items():
+                    if entry not in self.dirty:
+                        self.dirty[entry] = keys
+                    elif keys is None:
+                        self.dirty[entry] = None
+                    elif self.dirty[entry] is not None:
+                        self.dirty[entry] |= keys
+                raise
+
+            elapsed = (time.perf_counter() - start) * 1000
+            self.flush_count += 1
+            self.last_flush_ms = elapsed
+            self.total_flush_ms += elapsed
+            if self.on_flush is not None:
+                self.on_flush(elapsed)
+
+    async def close(self):
+        """Stop the background task and flush whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            'flush_count': self.flush_count,
+            'flush_errors': self.flush_errors,
+            'bytes_written': self.bytes_written,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'last_flush_ms': self.last_flush_ms,
+            'avg_flush_ms': self.total_flush_ms / self.flush_count if self.flush_count else 0.0,
+            'pending': len(self.dirty),
+        }
+
+
+class JsonStorage(Storage):
+    """Everything in one JSON file, only changed guilds are re-encoded"""
+
+    def __init__(self, path='user_data.json', interval=5.0):
+        super().__init__(interval)
+        self.path = path
+        self._encoded = {}  # {section_name: {guild_id: json_fragment}}
+
+    def attach(self, name, mapping):
+        super().attach(name, mapping)
+        self._encoded[name] = {}
+
+    def load(self, keep=None):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+
+        # Everything kept must be encoded once on the first flush
+        for name, section in data.items():
+            if isinstance(section, dict):
+                if keep is not None:
+                    data[name] = section = {guild: value for guild, value in section.items() if keep(guild)}
+                for guild in section:
+                    self.dirty[(name, guild)] = None
+        return data
+
+    def _write(self, changes):
+        for section, guild, keys, data in changes:
+            encoded = self._encoded.setdefault(section, {})
+            if data is _MISSING:
+                encoded.pop(guild, None)
+                continue
+            try:
+                encoded[guild] = json.dumps(data)
+            except (TypeError, ValueError) as e:
+                self._drop(section, guild, None, e)
+
+        parts = []
+        for name, encoded in self._encoded.items():
+            body = ", ".join(f"{json.dumps(g)}: {frag}" for g, frag in encoded.items())
+            parts.append(f"{json.dumps(name)}: {{{body}}}")
+        payload = ("{" + ", ".join(parts) + "}").encode('utf-8')
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.bytes_written += len(payload)
+        self.rows_written += len(changes)
+
+
+# section -> (table, key column, value column, key is an integer id, value is JSON encoded)
+SQLITE_TABLES = {
+    'sp_data': ('sp', 'user_id', 'sp', True, False),
+    'role_permissions': ('role_permissions', 'perm', 'role_ids', False, True),
+    'bracket_roles': ('bracket_roles', 'user_id', 'emojis', True, True),
+    'tournaments': ('tournaments', 'tournament_id', 'state', False, True),
+    'hoster_registrations': ('hoster_registrations', 'message_id', 'state', True, True),
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sp (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    sp INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sp_guild_points ON sp (guild_id, sp DESC);
+CREATE TABLE IF NOT EXISTS role_permissions (
+    guild_id INTEGER NOT NULL,
+    perm TEXT NOT NULL,
+    role_ids TEXT NOT NULL,
+    PRIMARY KEY (guild_id, perm)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bracket_roles (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    emojis TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tournaments (
+    guild_id INTEGER NOT NULL,
+    tournament_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (guild_id, tournament_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hoster_registrations (
+    guild_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (guild_id, message_id)
+) WITHOUT ROWID;
+"""
+
+
+class SqliteStorage(Storage):
+    """SQLite in WAL mode, one indexed row per guild entry so a change costs O(1)"""
+
+    row_level = True
+
+    def __init__(self, path='user_data.db', interval=5.0):
+        super().__init__(interval)
+        self.path = path
+        # Other worker processes may hold the write lock for a moment
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SQLITE_SCHEMA)
+        self.db.commit()
+
+    def load(self, keep=None):
+        data = {}
+        for section, (table, key_col, value_col, int_key, is_json) in SQLITE_TABLES.items():
+            section_data = data.setdefault(section, {})
+            rows = self.db.execute(f"SELECT guild_id, {key_col}, {value_col} FROM {table}")
+            for guild_id, key, value in rows:
+                if keep is not None and not keep(guild_id):
+                    continue
+                guild_data = section_data.setdefault(str(guild_id), {})
+                guild_data[str(key)] = json.loads(value) if is_json else value
+        return data
+
+    def import_json(self, path='user_data.json'):
+        """One-shot import of an existing user_data.json, skipped once done"""
+        done = self.db.execute("SELECT value FROM meta WHERE key = 'imported_json'").fetchone()
+        if done or not os.path.exists(path):
+            return False
+
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        changes = []
+        for section in SQLITE_TABLES:
+            for guild, guild_data in data.get(section, {}).items():
+                changes.append((section, guild, None, guild_data))
+        self._write(changes)
+        with self.db:
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('imported_json', ?)", (path,))
+        print(f"✅ Imported {len(changes)} guild entries from {path}")
+        return True
+
+    def _write(self, changes):
+        clears = {}  # {section: [(guild_id,)]}
+        deletes = {}  # {section: [(guild_id, key)]}
+        upserts = {}  # {section: [(guild_id, key, value)]}
+        size = 0  # estimated bytes of the rows written
+
+        for section, guild, keys, data in changes:
+            table, key_col, value_col, int_key, is_json = SQLITE_TABLES[section]
+            guild_id = int(guild)
+
+            if keys is None:
+                # Whole guild replaced
+                clears.setdefault(section, []).append((guild_id,))
+                items = [] if data is _MISSING else data.items()
+            else:
+                items = data.items()
+
+            for key, value in items:
+                try:
+                    db_key = _sqlite_int(int(key)) if int_key else key
+                    if value is not _MISSING:
+                        value = json.dumps(value) if is_json else _sqlite_int(value)
+                except (TypeError, ValueError) as e:
+                    self._drop(section, guild, key, e)
+                    continue
+                if value is _MISSING:
+                    deletes.setdefault(section, []).append((guild_id, db_key))
+                else:
+                    upserts.setdefault(section, []).append((guild_id, db_key, value))
+                    size += 8 + (len(db_key.encode('utf-8')) if isinstance(db_key, str) else 8)
+                    size += len(value.encode('utf-8')) if isinstance(value, str) else 8
+
+        rows = 0
+        with self.db:
+            for section, guild_ids in clears.items():
+                table = SQLITE_TABLES[section][0]
+                self.db.executemany(f"DELETE FROM {table} WHERE guild_id = ?", guild_ids)
+            for section, keys in deletes.items():
+                table, key_col = SQLITE_TABLES[section][:2]
+                self.db.executemany(f"DELETE FROM {table} WHERE guild_id = ? AND {key_col} = ?", keys)
+                rows += len(keys)
+            for section, values in upserts.items():
+                table, key_col, value_col = SQLITE_TABLES[section][:3]
+                self.db.executemany(
+                    f"INSERT INTO {table} (guild_id, {key_col}, {value_col}) VALUES (?, ?, ?) "
+                    f"ON CONFLICT (guild_id, {key_col}) DO UPDATE SET {value_col} = excluded.{value_col}",
+                    values
+                )
+                rows += len(values)
+        self.rows_written += rows
+        self.bytes_written += size
+
+    async def close(self):
+        await super().close()
+        self.db.close()
+
+
+def open_storage(backend='json', path=None, interval=5.0):
+    """Create the configured storage backend"""
+    if backend == 'sqlite':
+        storage = SqliteStorage(path or 'user_data.db', interval=interval)
+        storage.import_json('user_data.json')
+        return storage
+    if backend == 'json':
+        return JsonStorage(path or 'user_data.json', interval=interval)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from bracket import FORMATS, PENDING, Round, rank, seed_order
+
+
+def play(fmt, rng):
+    """Play a format to the end with random winners, return the number of rounds"""
+    rounds = 0
+    while not fmt.finished():
+        matches = fmt.next_matches()
+        assert matches, "an unfinished format must have matches to play"
+        seen = set()
+        for key, a, b in matches:
+            assert 0 <= a < fmt.player_count and 0 <= b < fmt.player_count and a != b
+            assert a not in seen and b not in seen, "a player is in two matches of one round"
+            seen.update((a, b))
+            winner, loser = (a, b) if rng.random() < 0.5 else (b, a)
+            fmt.set_winner(key, winner, loser)
+        rounds += 1
+        assert rounds <= 2 * fmt.player_count + 2
+    return rounds
+
+
+@pytest.mark.parametrize('name', sorted(FORMATS))
+def test_every_format_plays_out_and_places_everyone_once(name):
+    rng = random.Random(name)
+    for count in range(2, 257):
+        fmt = FORMATS[name](count)
+        play(fmt, rng)
+        placements = fmt.placements()
+        assert sorted(player for _, player in placements) == list(range(count)), count
+        places = [place for place, _ in placements]
+        assert places == sorted(places)
+        assert places[0] == 1 and places.count(1) == 1, count
+
+
+def test_single_elimination_round_count():
+    rng = random.Random(1)
+    for count in (2, 3, 8, 9, 16, 100, 256):
+        assert play(FORMATS['single'](count), rng) == (count - 1).bit_length()
+
+
+def test_swiss_avoids_rematches_when_possible():
+    fmt = FORMATS['swiss'](16)
+    play(fmt, random.Random(2))
+    for player, opponents in enumerate(fmt.opponents):
+        assert len(set(opponents)) == len(opponents), player
+
+
+def test_formats_need_two_players():
+    for fmt in FORMATS.values():
+        with pytest.raises(ValueError):
+            fmt(1)
+
+
+def test_seed_order_keeps_top_seeds_apart():
+    assert seed_order(8) == [0, 7, 3, 4, 1, 6, 2, 5]
+    order = seed_order(64)
+    assert sorted(order) == list(range(64))
+    assert order.index(1) >= 32  # seeds 1 and 2 only meet in the final
+
+
+def test_rank_shares_places_on_ties():
+    assert rank(['a', 'b', 'c', 'd'], key={'a': 1, 'b': 2, 'c': 2, 'd': 3}.get) == [
+        (1, 'a'), (2, 'b'), (2, 'c'), (4, 'd')]
+
+
+def test_round_counts_decided_matches():
+    current_round = Round([(0, 1), (2, 3)])
+    assert current_round.winner(0) == PENDING and not current_round.complete()
+    current_round.set_winner(0, 1)
+    current_round.set_winner(0, 1)
+    assert not current_round.complete()
+    current_round.set_winner(1, 2)
+    assert current_round.complete()
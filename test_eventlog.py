@@ -0,0 +1,137 @@
+import asyncio
+import copy
+import json
+
+from bracket import PENDING
+from eventlog import EventLog, read_events, replay, tail_events
+
+SNAPSHOT = {
+    'max_players': 8, 'state': 'open', 'channel': 10, 'target_channel': 10, 'message': [10, 20],
+    'players': [], 'format': None, 'results': [], 'fake_count': 1,
+    'map': "Map", 'abilities': "All", 'prize': "Gems", 'title': "Cup",
+}
+
+
+def sample_events():
+    """Two tournaments and SP changes in one guild, another guild's SP, with checkpoints in between"""
+    log = EventLog()
+    log.append('sp', 1, sp={'7': 5}, reason="sp_set")
+    log.append('create', 1, tournament='20', snapshot=SNAPSHOT)
+    log.append('register', 1, tournament='20', player=[1, "a", False])
+    log.checkpoint()
+    log.append('register', 1, tournament='20', player=[2, "b", False])
+    log.append('unregister', 1, tournament='20', user=1)
+    log.append('register', 1, tournament='20', player=[1, "a", False])
+    log.append('register', 1, tournament='20', player=[900, "FakePlayer1", True], fake_count=2)
+    log.append('register', 1, tournament='20', player=[3, "c", False])
+    log.append('create', 1, tournament='30', snapshot=dict(SNAPSHOT, message=[11, 30]))
+    log.append('register', 1, tournament='30', player=[4, "d", False])
+    log.checkpoint()
+    log.append('start', 1, tournament='20', state='running', format='single', message=[10, 21],
+               players=[[3, "c", False], [1, "a", False], [900, "FakePlayer1", True], [2, "b", False]], matches=2)
+    log.append('result', 1, tournament='20', round=1, winners=[[0, 0]])
+    log.append('result', 1, tournament='20', round=1, winners=[[1, 3]])
+    log.append('round', 1, tournament='20', round=2, matches=1, message=[10, 22])
+    log.append('sp', 2, sp={'8': 4}, reason="sp_import_set")
+    log.checkpoint()
+    log.append('result', 1, tournament='20', round=2, winners=[[0, 3]])
+    log.append('award', 1, sp={'2': 3}, points=3, tournament='20', place=1)
+    log.append('award', 1, sp={'3': 2}, points=2, tournament='20', place=2)
+    log.append('finish', 1, tournament='20')
+    log.append('sp', 1, sp={'7': 6}, reason="sp_add")
+    log.append('cancel', 1, tournament='30')
+    log.append('sp_reset', 2)
+    log.append('sp', 2, sp={'8': 1}, reason="sp_add")
+    return [json.loads(line) for line in log.pending]
+
+
+def rebuilt(events, sp_data=None, tournaments=None):
+    sp_data = copy.deepcopy(sp_data) if sp_data is not None else {}
+    tournaments = copy.deepcopy(tournaments) if tournaments is not None else {}
+    replay(events, sp_data, tournaments)
+    return sp_data, tournaments
+
+
+def test_replay_rebuilds_the_state():
+    events = sample_events()
+    sp_data, tournaments = rebuilt(events)
+    assert sp_data == {'1': {'7': 6, '2': 3, '3': 2}, '2': {'8': 1}}
+    assert tournaments == {}
+
+    # Stopped before the final result, tournament 20 is in round 2
+    sp_data, tournaments = rebuilt(events[:events.index(next(e for e in events if e['kind'] == 'award')) - 1])
+    snapshot = tournaments['1']['20']
+    assert snapshot['state'] == 'running' and snapshot['message'] == [10, 22]
+    assert [player[0] for player in snapshot['players']] == [3, 1, 900, 2]
+    assert snapshot['results'] == [[0, 3], [PENDING]]
+    assert snapshot['fake_count'] == 2
+    assert [player[0] for player in tournaments['1']['30']['players']] == [4]
+
+
+def test_replay_is_idempotent_over_stored_data():
+    # Stored data reflects any prefix of the log, replaying from any earlier point gives the same state
+    events = sample_events()
+    expected = rebuilt(events)
+    for stored in range(len(events) + 1):
+        base = rebuilt(events[:stored])
+        for start in range(stored + 1):
+            assert rebuilt(events[start:], *base) == expected, (start, stored)
+
+
+def test_replay_reports_what_changed():
+    events = [
+        {'seq': 1, 'kind': 'sp', 'guild': '1', 'sp': {'5': 1}},
+        {'seq': 2, 'kind': 'register', 'guild': '2', 'tournament': '9', 'player': [1, "a", False]},
+        {'seq': 3, 'kind': 'checkpoint'},
+    ]
+    tournaments = {}
+    assert replay(events, {}, tournaments) == {('sp_data', '1')}
+    assert tournaments == {}  # events of unknown tournaments are skipped
+
+
+def test_tail_events_starts_after_the_second_to_last_checkpoint(tmp_path):
+    path = tmp_path / 'events.log'
+    log = EventLog(str(path))
+    for seq in range(5000):
+        log.append('sp', 1, sp={'1': seq})
+        if seq % 1000 == 999:
+            log.checkpoint()
+    log.append('sp', 1, sp={'1': -1})
+    log._write(b"".join(log.pending))
+
+    events = tail_events(str(path))
+    assert [event['kind'] for event in events].count('checkpoint') == 1
+    assert events[0]['sp'] == {'1': 4000} and events[-1]['sp'] == {'1': -1}
+    assert len(list(read_events(str(path)))) == 5006
+
+
+def test_tail_events_without_checkpoints_is_the_whole_log(tmp_path):
+    path = tmp_path / 'events.log'
+    log = EventLog(str(path))
+    log.append('sp', 1, sp={'1': 1})
+    log.append('sp', 1, sp={'1': 2})
+    log._write(b"".join(log.pending))
+    assert [event['seq'] for event in tail_events(str(path))] == [1, 2]
+    assert tail_events(str(tmp_path / 'missing.log')) == []
+
+
+def test_open_drops_a_torn_tail_and_continues_the_sequence(tmp_path):
+    path = tmp_path / 'events.log'
+
+    async def write():
+        log = EventLog(str(path))
+        log.append('sp', 1, sp={'1': 1})
+        log.append('sp', 1, sp={'1': 2})
+        await log.flush()
+        assert log.batches == 1 and log.events_written == 2 and not log.pending
+
+    asyncio.run(write())
+    with open(path, 'ab') as f:
+        f.write(b'{"seq":3,"kind":"s')
+
+    log = EventLog(str(path))
+    assert [event['seq'] for event in log.open()] == [1, 2]
+    assert log.seq == 2
+    log.append('sp', 1, sp={'1': 3})
+    log._write(b"".join(log.pending))
+    assert [event['seq'] for event in read_events(str(path))] == [1, 2, 3]
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from bracket import FORMATS, PlayerRef
+from main import OPEN, RUNNING, Tournament
+
+
+class Guild:
+    """from_snapshot only looks channels up, none of them exist here"""
+
+    def get_channel(self, channel_id):
+        return None
+
+
+def running_tournament(name, count):
+    tournament = Tournament(1234)
+    tournament.max_players = 16
+    tournament.title, tournament.map, tournament.abilities, tournament.prize = "Cup", "Map", "All", "Gems"
+    for i in range(count):
+        tournament.add_player(PlayerRef(1000 + i, f"player{i}", is_fake=i % 4 == 3))
+    tournament.fake_count = 3
+    tournament.transition(OPEN)
+    tournament.transition(RUNNING)
+    tournament.start_format(name)
+    return tournament
+
+
+def report(tournament, matches):
+    """Record the first player of the first `matches` undecided matches of the round as winners"""
+    current_round = tournament.rounds[-1]
+    for match_index in range(len(current_round)):
+        if matches == 0:
+            return
+        a, b, winner = tournament.match_players(match_index)
+        if winner is None:
+            assert tournament.record_result(a.id)[0] == 'recorded'
+            matches -= 1
+
+
+def play_out(tournament):
+    while not tournament.format.finished():
+        if tournament.round_complete():
+            tournament.start_next_round()
+        report(tournament, len(tournament.rounds[-1]))
+    return [(place, player.id) for place, player in tournament.placements()]
+
+
+@pytest.mark.parametrize('name', sorted(FORMATS))
+@pytest.mark.parametrize('count', [2, 5, 11, 16])
+def test_snapshot_round_trips_mid_round(name, count):
+    tournament = running_tournament(name, count)
+    report(tournament, len(tournament.rounds[-1]))
+    if not tournament.format.finished():
+        tournament.start_next_round()
+        report(tournament, len(tournament.rounds[-1]) // 2)
+
+    snapshot = tournament.to_snapshot()
+    # Stored as JSON, tuples and int keys don't survive that
+    restored = Tournament.from_snapshot(json.loads(json.dumps(snapshot)), Guild(), tournament.id)
+
+    assert restored.to_snapshot() == snapshot
+    assert restored.player_index == tournament.player_index
+    assert list(restored.match_of) == list(tournament.match_of)
+    for match_index in range(len(tournament.rounds[-1])):
+        assert restored.match_players(match_index) == tournament.match_players(match_index)
+    # Both play on the same way
+    assert play_out(restored) == play_out(tournament)
+
+
+def test_snapshot_of_an_open_tournament():
+    tournament = Tournament(99)
+    tournament.max_players = 8
+    tournament.transition(OPEN)
+    tournament.add_player(PlayerRef(1, "one"))
+    tournament.add_player(PlayerRef(2, "two", is_fake=True))
+
+    restored = Tournament.from_snapshot(tournament.to_snapshot(), Guild(), 99)
+
+    assert restored.state == OPEN and restored.format is None and restored.rounds == []
+    assert [(p.id, p.name, p.is_fake) for p in restored.players] == [(1, "one", False), (2, "two", True)]
@@ -0,0 +1,85 @@
+import struct
+
+import pytest
+
+from seasons import INDEX_ENTRY, SeasonArchive
+
+STANDINGS = [(30, 900), (10, 500), (20, 500), (40, 100), (50, 0)]
+
+
+def test_append_and_read(tmp_path):
+    archive = SeasonArchive(str(tmp_path))
+    first = archive.append(1, STANDINGS, "Spring")
+    second = archive.append(1, [(10, 7)])
+
+    assert (first.number, first.players, second.number, second.players) == (1, 5, 2, 1)
+    assert [season.number for season in archive.seasons(1)] == [1, 2]
+    assert archive.read(1, first) == ("Spring", STANDINGS)
+    assert archive.read(1, archive.season(1, 2)) == ("", [(10, 7)])
+    assert archive.season(1, 0) is None and archive.season(1, 3) is None
+    assert archive.seasons(2) == [] and archive.season(2, 1) is None
+
+
+def test_partial_reads(tmp_path):
+    archive = SeasonArchive(str(tmp_path))
+    season = archive.append(1, STANDINGS, "Spring")
+    assert archive.read(1, season, 2) == ("Spring", STANDINGS[:2])
+    assert archive.read(1, season, 0) == ("Spring", [])
+    assert archive.read(1, season, 100) == ("Spring", STANDINGS)
+
+
+def test_top_and_history_share_ranks_on_ties(tmp_path):
+    archive = SeasonArchive(str(tmp_path))
+    archive.append(1, STANDINGS, "Spring")
+    archive.append(1, [(20, 50), (10, 40)], "Summer")
+
+    season, label, rows = archive.top(1, 1, 4)
+    assert (season.number, label) == (1, "Spring")
+    assert rows == [(1, 30, 900), (2, 10, 500), (2, 20, 500), (4, 40, 100)]
+    assert archive.top(1, 3) is None
+
+    history = [(season.number, label, rank, sp) for season, label, rank, sp in archive.history(1, 20)]
+    assert history == [(1, "Spring", 2, 500), (2, "Summer", 1, 50)]
+    assert archive.history(1, 99) == []
+
+
+def test_torn_index_entry_is_ignored_and_replaced(tmp_path):
+    archive = SeasonArchive(str(tmp_path))
+    archive.append(1, STANDINGS, "Spring")
+    _, index_path = archive._paths(1)
+    with open(index_path, 'ab') as f:
+        f.write(b"\x02\x00\x00")
+
+    assert [season.number for season in archive.seasons(1)] == [1]
+    assert archive.append(1, [(10, 7)], "Summer").number == 2
+    with open(index_path, 'rb') as f:
+        assert len(f.read()) == 2 * INDEX_ENTRY.size
+    assert archive.read(1, archive.season(1, 2)) == ("Summer", [(10, 7)])
+
+
+def test_damaged_block_is_detected(tmp_path):
+    archive = SeasonArchive(str(tmp_path))
+    season = archive.append(1, STANDINGS, "Spring")
+    data_path, _ = archive._paths(1)
+    with open(data_path, 'r+b') as f:
+        f.seek(season.offset + season.length // 2)
+        byte = f.read(1)
+        f.seek(-1, 1)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    with pytest.raises(ValueError):
+        archive.read(1, season)
+
+
+def test_rows_hold_64_bit_values(tmp_path):
+    archive = SeasonArchive(str(tmp_path))
+    rows = [(2 ** 64 - 1, 2 ** 63 - 1), (2 ** 60, -2 ** 63)]
+    season = archive.append(1, rows)
+    assert archive.read(1, season)[1] == rows
+
+    with pytest.raises(struct.error):
+        archive.append(1, [(1, 2 ** 63)])
+    with pytest.raises(struct.error):
+        archive.append(1, [(-1, 5)])
+    # A failed append leaves no season behind
+    assert [season.number for season in archive.seasons(1)] == [1]
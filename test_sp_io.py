@@ -0,0 +1,45 @@
+import io
+
+from sp_io import MAX_USER_ID, parse_sp_csv, write_sp_csv
+
+
+def test_header_columns_are_found_by_name():
+    rows, errors = parse_sp_csv("name,sp,rank,user_id\nalice,5,1,100\nbob,-3,2,200\n")
+    assert (rows, errors) == ([('100', 5), ('200', -3)], [])
+
+
+def test_without_header_the_first_two_columns_are_used():
+    rows, errors = parse_sp_csv("100,5\n\n  ,  \n200, 7 ,extra\n")
+    assert (rows, errors) == ([('100', 5), ('200', 7)], [])
+
+
+def test_bad_user_ids_are_rejected():
+    text = f"user_id,sp\nabc,1\n²,1\n{MAX_USER_ID + 1},1\n0,1\n-5,1\n{MAX_USER_ID},1\n"
+    rows, errors = parse_sp_csv(text)
+    assert rows == [(str(MAX_USER_ID), 1)]
+    assert [error.split(':')[0] for error in errors] == ["line 2", "line 3", "line 4", "line 5", "line 6"]
+
+
+def test_leading_zeros_name_the_same_player():
+    assert parse_sp_csv("0012,5\n") == ([('12', 5)], [])
+
+
+def test_bad_amounts_and_short_rows_are_rejected():
+    rows, errors = parse_sp_csv("100,1.5\n200,ten\n300\n400,\n500,2\n")
+    assert rows == [('500', 2)]
+    assert errors == [
+        "line 1: '1.5' is not a whole number",
+        "line 2: 'ten' is not a whole number",
+        "line 3: expected a user ID and an SP amount",
+        "line 4: '' is not a whole number",
+    ]
+
+
+def test_export_can_be_imported():
+    file = io.BytesIO()
+    entries = [(1, 300, "Zoë, the \"best\"", 9), (2, 100, "bob", 0)]
+    assert write_sp_csv(file, entries) == 2
+    assert not file.closed
+
+    rows, errors = parse_sp_csv(file.getvalue().decode('utf-8'))
+    assert (rows, errors) == ([('300', 9), ('100', 0)], [])